@@ -1,6 +1,14 @@
 from django.contrib import admin
 
 # Register your models here.
-from .models import VideoAnalytics
+from .models import AnalyticsCheckpoint, EngagementEvent, PlatformAnalyticsTotals, ReactionEvent, VideoAnalytics, VideoAnalyticsDaily, VideoAnalyticsHourly, VideoRetention, WatchEvent
 
-admin.site.register(VideoAnalytics)
\ No newline at end of file
+admin.site.register(VideoAnalytics)
+admin.site.register(WatchEvent)
+admin.site.register(EngagementEvent)
+admin.site.register(ReactionEvent)
+admin.site.register(VideoAnalyticsHourly)
+admin.site.register(VideoAnalyticsDaily)
+admin.site.register(AnalyticsCheckpoint)
+admin.site.register(PlatformAnalyticsTotals)
+admin.site.register(VideoRetention)
\ No newline at end of file
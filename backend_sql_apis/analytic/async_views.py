@@ -0,0 +1,166 @@
+import json
+import logging
+
+import redis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from . import dedupe, sketches, trending
+from .buffer import buffer_view
+from .cache import ainvalidate_video_summaries
+from .models import EngagementEvent, VideoAnalytics, VideoMetadata, WatchEvent
+from .redis_client import get_async_redis
+from .serializers import EngagementSerializer, TrackViewSerializer
+
+logger = logging.getLogger(__name__)
+
+# Async versions of TrackViewAPIView and EngagementTrackAPIView for deployments under
+# sql_apis.asgi (see README). Same payloads and responses, but the database and Redis are
+# awaited instead of holding a worker thread, and each event's Redis writes go out in one
+# pipelined round trip.
+
+
+def _authenticate(request):
+    """Authentication, IsAuthenticatedOrReadOnly and throttling as APIView applies them to the sync views.
+
+    Returns (user, None) or (None, error response). Runs in a thread: the JWT user lookup and the
+    throttle cache are synchronous.
+    """
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        user = drf_request.user
+    except exceptions.AuthenticationFailed as e:
+        detail = e.detail if isinstance(e.detail, dict) else {"detail": e.detail}
+        return None, JsonResponse(detail, status=401)
+    if not user.is_authenticated:
+        return None, JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+
+    for throttle_class in APIView.throttle_classes:
+        if not throttle_class().allow_request(drf_request, None):
+            return None, JsonResponse({"detail": "Request was throttled."}, status=429)
+
+    request.user = user
+    return user, None
+
+
+def _json_body(request):
+    try:
+        return json.loads(request.body or b'{}')
+    except ValueError:
+        return None
+
+
+def _count_view(video, user, duration):
+    with transaction.atomic():
+        analytics, _ = VideoAnalytics.objects.get_or_create(video=video)
+        VideoAnalytics.objects.filter(pk=analytics.pk).update(views=F('views') + 1)
+        WatchEvent.objects.create(video=video, user=user, duration=duration)
+
+
+def _buffer_view(video, user, duration):
+    # Buffered last: a failed insert counts nothing, and a failed buffer rolls the insert back
+    with transaction.atomic():
+        WatchEvent.objects.create(video=video, user=user, duration=duration)
+        buffer_view(video.id)
+
+
+@csrf_exempt
+@require_POST
+async def track_view(request):
+    try:
+        user, error = await sync_to_async(_authenticate)(request)
+        if error:
+            return error
+
+        serializer = TrackViewSerializer(data=_json_body(request))
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
+        video_id = serializer.validated_data['video_id']
+        duration = serializer.validated_data['duration']
+        viewer = sketches.viewer_id(request)
+
+        event_id = serializer.validated_data.get('event_id')
+        if event_id and (await dedupe.aseen('view', viewer, [event_id]))[0]:
+            return JsonResponse({"message": "View already recorded.", "duplicate": True})
+
+        try:
+            video = await VideoMetadata.objects.only('id', 'user').aget(id=video_id)
+        except VideoMetadata.DoesNotExist:
+            return JsonResponse({"error": "Video not found"}, status=404)
+
+        if settings.ANALYTICS_VIEW_BUFFER_ENABLED:
+            await sync_to_async(_buffer_view)(video, user, duration)
+        else:
+            await sync_to_async(_count_view)(video, user, duration)
+            await ainvalidate_video_summaries([video.id])
+
+        # Only a stored view is counted elsewhere and makes its id a duplicate, so a failed
+        # attempt can be retried without counting it twice
+        pipe = get_async_redis().pipeline(transaction=False)
+        trending.queue_record(pipe, {video.id: 1}, 'view')
+        sketches.queue_viewer(pipe, video.id, viewer)
+        sketches.queue_watch_time(pipe, video.id, video.user_id, duration)
+        try:
+            await pipe.execute()
+        except redis.RedisError:
+            logger.warning("Could not record view sketches for video %s", video.id, exc_info=True)
+        if event_id:
+            await dedupe.aadd('view', viewer, [event_id])
+
+        return JsonResponse({"message": "View recorded successfully."})
+
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+@csrf_exempt
+@require_POST
+async def track_engagement(request):
+    try:
+        user, error = await sync_to_async(_authenticate)(request)
+        if error:
+            return error
+
+        serializer = EngagementSerializer(data=_json_body(request))
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
+        video_id = serializer.validated_data['video_id']
+        viewer = sketches.viewer_id(request)
+
+        event_id = serializer.validated_data.get('event_id')
+        if event_id and (await dedupe.aseen('engagement', viewer, [event_id]))[0]:
+            return JsonResponse({"message": "Engagement already tracked.", "duplicate": True})
+
+        if not await VideoMetadata.objects.filter(id=video_id).aexists():
+            return JsonResponse({"error": "Video not found"}, status=404)
+
+        await EngagementEvent.objects.acreate(
+            video_id=video_id,
+            user=user,
+            event_type=serializer.validated_data['event_type'],
+            timestamp=serializer.validated_data['timestamp'],
+            details=serializer.validated_data.get('details', {}),
+        )
+        if event_id:
+            await dedupe.aadd('engagement', viewer, [event_id])
+
+        pipe = get_async_redis().pipeline(transaction=False)
+        trending.queue_record(pipe, {video_id: 1}, 'engagement')
+        try:
+            await pipe.execute()
+        except redis.RedisError:
+            logger.warning("Could not record engagement for trending", exc_info=True)
+
+        return JsonResponse({"message": "Engagement tracked successfully."})
+
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
@@ -0,0 +1,37 @@
+import statistics
+from contextlib import contextmanager
+
+from rest_framework.throttling import SimpleRateThrottle
+
+# Shared by the benchmark and bench_ingest management commands.
+
+
+def summarize(latencies, elapsed, failures, queries=None):
+    """Throughput and latency percentiles (ms) of one run; `queries` is the total SQL query count."""
+    latencies = sorted(latencies)
+    if len(latencies) > 1:
+        cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+    else:
+        cuts = (latencies or [0.0]) * 99
+    result = {
+        "requests": len(latencies),
+        "failures": failures,
+        "requests_per_second": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(cuts[49] * 1000, 2),
+        "p95_ms": round(cuts[94] * 1000, 2),
+        "p99_ms": round(cuts[98] * 1000, 2),
+    }
+    if queries is not None:
+        result["queries_per_request"] = round(queries / len(latencies), 2) if latencies else 0.0
+    return result
+
+
+@contextmanager
+def throttles_disabled():
+    """Let a benchmark's few users send thousands of requests; every DRF rate throttle allows them."""
+    allow_request = SimpleRateThrottle.allow_request
+    SimpleRateThrottle.allow_request = lambda self, request, view: True
+    try:
+        yield
+    finally:
+        SimpleRateThrottle.allow_request = allow_request
@@ -0,0 +1,130 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from redis.exceptions import LockError
+
+from videos.models import VideoMetadata
+
+from .cache import invalidate_video_summaries
+from .models import AnalyticsCheckpoint, VideoAnalytics
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# New views are counted in PENDING_KEY. A flush claims up to a batch of videos at a time: one
+# script moves their counts into CLAIMED_KEY and numbers the batch in BATCH_KEY. The batch is
+# applied in a transaction that also moves the view-flush checkpoint to its number, and only
+# then dropped from Redis. A flush that dies in between finds the same batch claimed, and the
+# checkpoint tells it the batch was already applied, so views are never counted twice.
+PENDING_KEY = 'analytics:views:pending'
+CLAIMED_KEY = 'analytics:views:claimed'
+BATCH_KEY = 'analytics:views:batch'
+SEQUENCE_KEY = 'analytics:views:sequence'
+LOCK_KEY = 'analytics:views:flush-lock'
+CHECKPOINT = 'views:flush'
+
+# KEYS: pending, claimed, batch, sequence. ARGV: batch size, last applied batch.
+# Returns {batch number, flat field/count list} or nil when nothing is buffered.
+_CLAIM_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    return {redis.call('GET', KEYS[3]), redis.call('HGETALL', KEYS[2])}
+end
+local fields = redis.call('HSCAN', KEYS[1], 0, 'COUNT', ARGV[1])[2]
+if #fields == 0 then
+    return nil
+end
+for i = 1, #fields, 2 do
+    redis.call('HSET', KEYS[2], fields[i], fields[i + 1])
+    redis.call('HDEL', KEYS[1], fields[i])
+end
+local batch = redis.call('INCR', KEYS[4])
+if batch <= tonumber(ARGV[2]) then
+    -- The sequence was lost with Redis data; number past what Postgres has already applied
+    batch = tonumber(ARGV[2]) + 1
+    redis.call('SET', KEYS[4], batch)
+end
+redis.call('SET', KEYS[3], batch)
+return {tostring(batch), fields}
+"""
+
+# KEYS: claimed, batch. ARGV: batch number. Drops the batch only if it is still the claimed one.
+_FINISH_SCRIPT = """
+if redis.call('GET', KEYS[2]) == ARGV[1] then
+    redis.call('DEL', KEYS[1], KEYS[2])
+end
+return 0
+"""
+
+
+def buffer_view(video_id, count=1):
+    get_redis().hincrby(PENDING_KEY, video_id, count)
+
+
+def flush_views(batch_size=None):
+    """Move buffered view counts into VideoAnalytics.views. Returns the number of views flushed."""
+    batch_size = batch_size or settings.ANALYTICS_VIEW_FLUSH_BATCH_SIZE
+    client = get_redis()
+    lock = client.lock(LOCK_KEY, timeout=max(settings.ANALYTICS_VIEW_FLUSH_INTERVAL * 6, 60))
+    if not lock.acquire(blocking=False):
+        return 0  # another worker is flushing
+
+    try:
+        # Views arriving during the flush wait for the next one, so a busy buffer cannot keep it running
+        backlog = client.hlen(CLAIMED_KEY) + client.hlen(PENDING_KEY)
+        applied = AnalyticsCheckpoint.objects.filter(name=CHECKPOINT).values_list('position', flat=True).first() or 0
+        flushed = claimed = 0
+        while claimed < backlog:
+            try:
+                lock.reacquire()
+            except LockError:
+                logger.warning("View flush lock lost after %d views; leaving the rest to the next flush", flushed)
+                break
+
+            batch = client.register_script(_CLAIM_SCRIPT)(
+                keys=[PENDING_KEY, CLAIMED_KEY, BATCH_KEY, SEQUENCE_KEY], args=[batch_size, applied]
+            )
+            if not batch:
+                break
+            batch_id, fields = int(batch[0]), batch[1]
+            counts = {int(video_id): int(n) for video_id, n in zip(fields[::2], fields[1::2])}
+            if _apply_counts(counts, batch_id):
+                flushed += sum(counts.values())
+            client.register_script(_FINISH_SCRIPT)(keys=[CLAIMED_KEY, BATCH_KEY], args=[batch_id])
+            invalidate_video_summaries(counts)
+            applied = max(applied, batch_id)
+            claimed += len(counts)
+        return flushed
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            logger.warning("View flush lock expired before the flush finished")
+
+
+def _apply_counts(counts, batch_id):
+    """Add one claimed batch to the counters. Returns False if it was applied before."""
+    with transaction.atomic():
+        AnalyticsCheckpoint.objects.get_or_create(name=CHECKPOINT)
+        checkpoint = AnalyticsCheckpoint.objects.select_for_update().get(name=CHECKPOINT)
+        if checkpoint.position >= batch_id:
+            return False
+
+        existing = set(VideoAnalytics.objects.filter(video_id__in=counts).values_list('video_id', flat=True))
+        missing = set(counts) - existing
+        if missing:
+            # Views for deleted videos are dropped with the video
+            live = VideoMetadata.objects.filter(id__in=missing).values_list('id', flat=True)
+            VideoAnalytics.objects.bulk_create([VideoAnalytics(video_id=video_id) for video_id in live], ignore_conflicts=True)
+
+        VideoAnalytics.objects.filter(video_id__in=counts).update(
+            views=F('views') + Case(
+                *[When(video_id=video_id, then=Value(n)) for video_id, n in counts.items()],
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        )
+        checkpoint.position = batch_id
+        checkpoint.save(update_fields=['position', 'updated_at'])
+    return True
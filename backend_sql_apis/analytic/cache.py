@@ -0,0 +1,109 @@
+import logging
+import time
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+
+from videos.models import VideoMetadata
+
+from . import sketches
+from .models import VideoAnalytics
+from .rollups import average_watch_time
+
+logger = logging.getLogger(__name__)
+
+# Per-video summaries (views, likes, watch time) are cached in the default cache (Redis).
+# Writers delete the entry; the TTL bounds staleness for anything that changes without an
+# explicit invalidation (rollups, watch-time histograms).
+
+def _summary_key(video_id):
+    return f'analytics:summary:{video_id}'
+
+
+def _lock_key(video_id):
+    return f'analytics:summary:{video_id}:lock'
+
+
+def get_video_summary(video_id):
+    """Cached summary of a video, or None if the video does not exist."""
+    try:
+        summary = cache.get(_summary_key(video_id))
+        if summary is not None:
+            return summary
+
+        # Single flight: only the request that takes the lock recomputes a cold key, the others
+        # wait for its result instead of all hitting the database at once
+        lock_timeout = settings.ANALYTICS_SUMMARY_LOCK_TIMEOUT
+        locked = cache.add(_lock_key(video_id), 1, timeout=lock_timeout)
+    except redis.RedisError as e:
+        logger.warning("Summary cache unavailable: %s", e)
+        return compute_video_summary(video_id)
+    if not locked:
+        return _wait_for_summary(video_id, lock_timeout)
+
+    try:
+        summary = compute_video_summary(video_id)
+        if summary is not None:
+            try:
+                cache.set(_summary_key(video_id), summary, timeout=settings.ANALYTICS_SUMMARY_CACHE_TTL)
+            except redis.RedisError as e:
+                logger.warning("Could not cache the summary of video %s: %s", video_id, e)
+        return summary
+    finally:
+        try:
+            cache.delete(_lock_key(video_id))
+        except redis.RedisError as e:
+            # The lock expires after ANALYTICS_SUMMARY_LOCK_TIMEOUT; waiters compute it themselves meanwhile
+            logger.warning("Could not release the summary lock of video %s: %s", video_id, e)
+
+
+def _wait_for_summary(video_id, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        try:
+            summary = cache.get(_summary_key(video_id))
+            if summary is not None:
+                return summary
+            if cache.get(_lock_key(video_id)) is None:
+                break  # the holder finished without caching (missing video) or failed
+        except redis.RedisError as e:
+            logger.warning("Summary cache unavailable: %s", e)
+            break
+    return compute_video_summary(video_id)
+
+
+def compute_video_summary(video_id):
+    if not VideoMetadata.objects.filter(id=video_id).exists():
+        return None
+
+    # Read-only: videos without a VideoAnalytics row simply have no views or reactions yet
+    counters = VideoAnalytics.objects.filter(video_id=video_id).values('views', 'likes', 'dislikes').first()
+    counters = counters or {'views': 0, 'likes': 0, 'dislikes': 0}
+    return {
+        "video_id": video_id,
+        **counters,
+        "average_watch_time": average_watch_time(video_id),
+        "watch_time_percentiles": sketches.video_watch_percentiles([video_id]).get(video_id),
+    }
+
+
+def invalidate_video_summaries(video_ids):
+    keys = [_summary_key(video_id) for video_id in video_ids]
+    if not keys:
+        return
+    try:
+        cache.delete_many(keys)
+    except redis.RedisError as e:
+        logger.warning("Could not invalidate %d video summaries: %s", len(keys), e)
+
+
+async def ainvalidate_video_summaries(video_ids):
+    keys = [_summary_key(video_id) for video_id in video_ids]
+    if not keys:
+        return
+    try:
+        await cache.adelete_many(keys)
+    except redis.RedisError as e:
+        logger.warning("Could not invalidate %d video summaries: %s", len(keys), e)
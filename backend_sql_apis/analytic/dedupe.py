@@ -0,0 +1,186 @@
+import hashlib
+import logging
+import math
+import time
+
+import redis
+from django.conf import settings
+
+from .redis_client import get_async_redis, get_redis
+
+logger = logging.getLogger(__name__)
+
+# Client event ids are remembered in a rotating Bloom filter: one Redis bitmap per window of
+# ANALYTICS_DEDUPE_WINDOW seconds, sized for ANALYTICS_DEDUPE_CAPACITY ids at
+# ANALYTICS_DEDUPE_ERROR_RATE. An id is checked against the current and the previous window,
+# so retries are caught for at least one full window, and memory stays at two bitmaps however
+# many events arrive. A false positive drops a genuine event; it never double counts one.
+# Views check an id before writing and add it only once the event is stored, so a request that
+# fails can be retried with the same id. Two copies of an event racing each other can then both
+# be stored; losing an event to a failed first attempt would be worse.
+_SEEN_SCRIPT = """
+local function has(key)
+    for i = 2, #ARGV do
+        if redis.call('GETBIT', key, ARGV[i]) == 0 then
+            return false
+        end
+    end
+    return true
+end
+if has(KEYS[1]) or has(KEYS[2]) then
+    redis.call('INCR', KEYS[3])
+    redis.call('EXPIRE', KEYS[3], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+_ADD_SCRIPT = """
+for i = 2, #ARGV do
+    redis.call('SETBIT', KEYS[1], ARGV[i], 1)
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+return 0
+"""
+
+
+def _filter_key(generation):
+    return f'analytics:dedupe:{generation}'
+
+
+def _items_key(generation):
+    return f'{_filter_key(generation)}:items'
+
+
+def _duplicates_key(generation):
+    return f'{_filter_key(generation)}:duplicates'
+
+
+def filter_size():
+    """(bits, hash functions) of one window's filter."""
+    capacity = settings.ANALYTICS_DEDUPE_CAPACITY
+    bits = math.ceil(-capacity * math.log(settings.ANALYTICS_DEDUPE_ERROR_RATE) / math.log(2) ** 2)
+    hashes = max(round(bits / capacity * math.log(2)), 1)
+    return bits, hashes
+
+
+def _offsets(event_key, bits, hashes):
+    # Double hashing: k positions from two independent 64-bit halves of one digest
+    digest = hashlib.blake2b(event_key.encode(), digest_size=16).digest()
+    h1, h2 = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+    return [(h1 + i * h2) % bits for i in range(hashes)]
+
+
+def _generation(now=None):
+    return int((now or time.time()) // settings.ANALYTICS_DEDUPE_WINDOW)
+
+
+def _queue_seen(pipe, kind, viewer, event_ids):
+    bits, hashes = filter_size()
+    generation = _generation()
+    keys = [_filter_key(generation), _filter_key(generation - 1), _duplicates_key(generation)]
+    ttl = settings.ANALYTICS_DEDUPE_WINDOW * 2
+    for event_id in event_ids:
+        pipe.eval(_SEEN_SCRIPT, len(keys), *keys, ttl, *_offsets(f'{kind}:{viewer}:{event_id}', bits, hashes))
+
+
+def _queue_add(pipe, kind, viewer, event_ids):
+    bits, hashes = filter_size()
+    generation = _generation()
+    keys = [_filter_key(generation), _items_key(generation)]
+    ttl = settings.ANALYTICS_DEDUPE_WINDOW * 2
+    for event_id in event_ids:
+        pipe.eval(_ADD_SCRIPT, len(keys), *keys, ttl, *_offsets(f'{kind}:{viewer}:{event_id}', bits, hashes))
+
+
+def seen(kind, viewer, event_ids):
+    """For each client event id, whether it was already stored in the last window.
+
+    Ids are scoped to the viewer (see sketches.viewer_id) so one client cannot suppress another's
+    events. If Redis is unavailable nothing is treated as a duplicate.
+    """
+    if not event_ids:
+        return []
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        _queue_seen(pipe, kind, viewer, event_ids)
+        results = pipe.execute()
+    except redis.RedisError:
+        logger.warning("Could not check %d %s event ids for duplicates", len(event_ids), kind, exc_info=True)
+        return [False] * len(event_ids)
+    return [bool(duplicate) for duplicate in results]
+
+
+def add(kind, viewer, event_ids):
+    """Remember client event ids; call once their events are stored."""
+    if not event_ids:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        _queue_add(pipe, kind, viewer, event_ids)
+        pipe.execute()
+    except redis.RedisError:
+        logger.warning("Could not remember %d %s event ids", len(event_ids), kind, exc_info=True)
+
+
+async def aseen(kind, viewer, event_ids):
+    """seen() for async views, on the asyncio Redis client."""
+    if not event_ids:
+        return []
+    try:
+        pipe = get_async_redis().pipeline(transaction=False)
+        _queue_seen(pipe, kind, viewer, event_ids)
+        results = await pipe.execute()
+    except redis.RedisError:
+        logger.warning("Could not check %d %s event ids for duplicates", len(event_ids), kind, exc_info=True)
+        return [False] * len(event_ids)
+    return [bool(duplicate) for duplicate in results]
+
+
+async def aadd(kind, viewer, event_ids):
+    """add() for async views, on the asyncio Redis client."""
+    if not event_ids:
+        return
+    try:
+        pipe = get_async_redis().pipeline(transaction=False)
+        _queue_add(pipe, kind, viewer, event_ids)
+        await pipe.execute()
+    except redis.RedisError:
+        logger.warning("Could not remember %d %s event ids", len(event_ids), kind, exc_info=True)
+
+
+def stats():
+    """Memory use and estimated false-positive rate of the live filters."""
+    bits, hashes = filter_size()
+    client = get_redis()
+    generation = _generation()
+
+    windows = []
+    for current in (generation, generation - 1):
+        key = _filter_key(current)
+        set_bits = client.bitcount(key)
+        windows.append({
+            "window_start": current * settings.ANALYTICS_DEDUPE_WINDOW,
+            "items": int(client.get(_items_key(current)) or 0),
+            "duplicates": int(client.get(_duplicates_key(current)) or 0),
+            "memory_bytes": client.strlen(key),
+            "fill_ratio": set_bits / bits,
+            # Chance that an unseen id finds all of its k bits already set
+            "false_positive_rate": (set_bits / bits) ** hashes,
+        })
+
+    not_matched = 1.0
+    for window in windows:
+        not_matched *= 1 - window["false_positive_rate"]
+    return {
+        "window_seconds": settings.ANALYTICS_DEDUPE_WINDOW,
+        "capacity": settings.ANALYTICS_DEDUPE_CAPACITY,
+        "target_error_rate": settings.ANALYTICS_DEDUPE_ERROR_RATE,
+        "bits": bits,
+        "hashes": hashes,
+        "memory_bytes": sum(window["memory_bytes"] for window in windows),
+        "false_positive_rate": 1 - not_matched,
+        "windows": windows,
+    }
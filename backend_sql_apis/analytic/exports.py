@@ -0,0 +1,77 @@
+import csv
+import json
+from datetime import date, datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from engagement.models import Like
+
+from .models import EngagementEvent, VideoAnalyticsHourly, WatchEvent
+
+# dataset -> (model, exported fields, field the time range applies to)
+DATASETS = {
+    'views': (VideoAnalyticsHourly, ['id', 'video_id', 'bucket', 'views', 'watch_seconds'], 'bucket'),
+    'watch_events': (WatchEvent, ['id', 'video_id', 'user_id', 'duration', 'created_at'], 'created_at'),
+    'engagements': (EngagementEvent, ['id', 'video_id', 'user_id', 'event_type', 'timestamp', 'details', 'created_at'], 'created_at'),
+    'likes': (Like, ['id', 'video_id', 'user_id', 'like_status', 'created_at'], 'created_at'),
+}
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+ROWS_PER_CHUNK = 500
+
+
+def export_rows(dataset, start=None, end=None, after_id=0, chunk_size=2000):
+    """Rows of a dataset in id order, read through a server-side cursor.
+
+    Every row starts with its id, so an interrupted export resumes with after_id set to the last id received.
+    """
+    model, fields, time_field = DATASETS[dataset]
+    queryset = model.objects.filter(pk__gt=after_id)
+    if start:
+        queryset = queryset.filter(**{f'{time_field}__gte': start})
+    if end:
+        queryset = queryset.filter(**{f'{time_field}__lt': end})
+    return fields, queryset.order_by('pk').values_list(*fields).iterator(chunk_size=chunk_size)
+
+
+def stream_export(fields, rows, output_format):
+    """Encode rows as CSV or NDJSON, yielding one string per ROWS_PER_CHUNK rows."""
+    encode = _csv_encoder() if output_format == 'csv' else _ndjson_encoder(fields)
+    if output_format == 'csv':
+        yield encode(fields)
+
+    lines = []
+    for row in rows:
+        lines.append(encode(row))
+        if len(lines) >= ROWS_PER_CHUNK:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+class _Echo:
+    """File-like object whose write() returns the value, so csv.writer can encode one line at a time."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_encoder():
+    writer = csv.writer(_Echo())
+
+    def cell(value):
+        if isinstance(value, (dict, list)):
+            return json.dumps(value)
+        if isinstance(value, (date, datetime)):
+            return value.isoformat()
+        return value
+
+    def encode(row):
+        return writer.writerow([cell(value) for value in row])
+    return encode
+
+
+def _ndjson_encoder(fields):
+    def encode(row):
+        return json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder) + '\n'
+    return encode
@@ -0,0 +1,173 @@
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from analytic.models import AnalyticsCheckpoint, EngagementEvent, VideoAnalytics, WatchEvent
+
+User = get_user_model()
+
+CHECKPOINT = 'backfill:analytics'
+EVENT_TYPES = {choice for choice, _ in EngagementEvent.EVENT_TYPE_CHOICES}
+
+
+def _init_worker():
+    # Needed under the spawn start method; under fork it drops connections inherited from the parent
+    django.setup()
+    connections.close_all()
+
+
+def _parse_timestamp(value):
+    parsed = parse_datetime(value or '') if isinstance(value, str) else None
+    if parsed is None:
+        return timezone.now()
+    return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+
+
+def _explode(rows):
+    """Build WatchEvent and EngagementEvent objects from the legacy JSON of one chunk."""
+    user_ids = {
+        entry.get('user_id')
+        for row in rows
+        for entry in row.watch_time + row.engagements
+        if isinstance(entry, dict) and entry.get('user_id')
+    }
+    known_users = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+
+    watch_events, engagement_events, skipped = [], [], 0
+    for row in rows:
+        for entry in row.watch_time:
+            if not isinstance(entry, dict):
+                skipped += 1
+                continue
+            user_id = entry.get('user_id')
+            watch_events.append(WatchEvent(
+                video_id=row.video_id,
+                user_id=user_id if user_id in known_users else None,
+                duration=max(int(entry.get('duration') or 0), 0),
+                created_at=_parse_timestamp(entry.get('timestamp')),
+            ))
+        for entry in row.engagements:
+            if not isinstance(entry, dict) or entry.get('event_type') not in EVENT_TYPES:
+                skipped += 1
+                continue
+            user_id = entry.get('user_id')
+            timestamp = _parse_timestamp(entry.get('timestamp'))
+            engagement_events.append(EngagementEvent(
+                video_id=row.video_id,
+                user_id=user_id if user_id in known_users else None,
+                event_type=entry['event_type'],
+                timestamp=timestamp,
+                details=entry.get('details') if isinstance(entry.get('details'), dict) else {},
+                created_at=timestamp,
+            ))
+    return watch_events, engagement_events, skipped
+
+
+def backfill_range(lower, upper, chunk_size, progress=None):
+    """Move the legacy entries of analytics rows with lower < pk <= upper.
+
+    Each chunk is copied, cleared and checkpointed in one short transaction, so an interrupted
+    run resumes after the last committed chunk and a re-run never duplicates entries.
+    Returns (analytics rows, watch events, engagement events, skipped entries).
+    """
+    name = f'{CHECKPOINT}:{lower}-{upper}'
+    checkpoint, _ = AnalyticsCheckpoint.objects.get_or_create(name=name, defaults={'position': lower})
+    last_pk = checkpoint.position
+    totals = [0, 0, 0, 0]
+
+    while True:
+        rows = list(
+            VideoAnalytics.objects
+            .filter(pk__gt=last_pk, pk__lte=upper)
+            .exclude(watch_time=[], engagements=[])
+            .order_by('pk')
+            .only('pk', 'video_id', 'watch_time', 'engagements')[:chunk_size]
+        )
+        if not rows:
+            break
+
+        watch_events, engagement_events, skipped = _explode(rows)
+        last_pk = rows[-1].pk
+        with transaction.atomic():
+            WatchEvent.objects.bulk_create(watch_events, batch_size=1000)
+            EngagementEvent.objects.bulk_create(engagement_events, batch_size=1000)
+            VideoAnalytics.objects.filter(pk__in=[row.pk for row in rows]).update(watch_time=[], engagements=[])
+            AnalyticsCheckpoint.objects.filter(pk=checkpoint.pk).update(position=last_pk)
+
+        chunk = (len(rows), len(watch_events), len(engagement_events), skipped)
+        totals = [total + count for total, count in zip(totals, chunk)]
+        if progress:
+            progress(last_pk, totals)
+
+    checkpoint.delete()
+    return tuple(totals)
+
+
+def split_range(lower, upper, parts):
+    step = max(math.ceil((upper - lower) / parts), 1)
+    return [(start, min(start + step, upper)) for start in range(lower, upper, step)]
+
+
+class Command(BaseCommand):
+    help = "Move legacy VideoAnalytics.watch_time and engagements JSON into WatchEvent and EngagementEvent."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=200, help='Analytics rows handled per transaction.')
+        parser.add_argument('--workers', type=int, default=1, help='Split the id range across this many processes.')
+        parser.add_argument('--restart', action='store_true', help='Forget saved progress and scan from the first row.')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        workers = max(options['workers'], 1)
+
+        if options['restart']:
+            AnalyticsCheckpoint.objects.filter(name__startswith=CHECKPOINT).delete()
+        checkpoint, _ = AnalyticsCheckpoint.objects.get_or_create(name=CHECKPOINT)
+        lower = checkpoint.position
+        upper = VideoAnalytics.objects.aggregate(top=Max('pk'))['top'] or 0
+        if upper <= lower:
+            self.stdout.write(self.style.SUCCESS("Nothing to backfill."))
+            return
+
+        # Ranges depend only on the saved position and the current max id, so re-running with the
+        # same --workers after an interruption picks up each range's own checkpoint
+        ranges = split_range(lower, upper, workers)
+        started = time.monotonic()
+        totals = [0, 0, 0, 0]
+
+        if workers == 1:
+            def progress(last_pk, done):
+                self._report(f"Up to analytics id {last_pk}:", done, started)
+            totals = list(backfill_range(lower, upper, chunk_size, progress))
+        else:
+            # Children must open their own connections; never share the parent's across a fork
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                futures = {pool.submit(backfill_range, start, end, chunk_size): (start, end) for start, end in ranges}
+                for future in as_completed(futures):
+                    start, end = futures[future]
+                    totals = [total + count for total, count in zip(totals, future.result())]
+                    self._report(f"Finished ids {start + 1}-{end}:", totals, started)
+
+        AnalyticsCheckpoint.objects.filter(name=CHECKPOINT).update(position=upper)
+        rows, watched, engaged, skipped = totals
+        self.stdout.write(self.style.SUCCESS(
+            f"Backfill complete: {rows} analytics rows, {watched} watch and {engaged} engagement entries moved"
+            f" ({skipped} malformed skipped) in {time.monotonic() - started:.1f}s."
+        ))
+
+    def _report(self, prefix, totals, started):
+        rows, watched, engaged, _ = totals
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            f"{prefix} {rows} rows, {watched + engaged} entries moved "
+            f"({rows / elapsed:.0f} rows/s, {(watched + engaged) / elapsed:.0f} entries/s)"
+        )
@@ -0,0 +1,91 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from analytic.models import ReactionEvent, VideoAnalytics
+from engagement.models import Like
+from videos.models import VideoMetadata
+
+_COUNTS = {'like': (1, 0), 'dislike': (0, 1)}
+
+
+def backfill_batch(video_ids):
+    """Give each video the ReactionEvents that sum to its counters. Returns the events created.
+
+    A video with no events yet gets one per Like, dated when the Like was made; whatever still
+    differs from the counters (flips made before the events existed) becomes one event dated now.
+    Videos whose events already match are left alone, so re-running creates nothing.
+    """
+    with transaction.atomic():
+        # Locked like reconcile_like_counts does, so reactions committing meanwhile wait for the batch
+        counters = {
+            video_id: (likes, dislikes)
+            for video_id, likes, dislikes in (
+                VideoAnalytics.objects.select_for_update().filter(video_id__in=video_ids).values_list('video_id', 'likes', 'dislikes')
+            )
+        }
+        sums = {
+            video_id: [likes, dislikes]
+            for video_id, likes, dislikes in (
+                ReactionEvent.objects.filter(video_id__in=video_ids)
+                .values('video_id')
+                .annotate(likes=Sum('likes'), dislikes=Sum('dislikes'))
+                .values_list('video_id', 'likes', 'dislikes')
+                .order_by()
+            )
+        }
+
+        events = []
+        likes = Like.objects.filter(video_id__in=[video_id for video_id in video_ids if video_id not in sums])
+        for video_id, like_status, created_at in likes.values_list('video_id', 'like_status', 'created_at').iterator():
+            delta = _COUNTS[like_status]
+            events.append(ReactionEvent(video_id=video_id, likes=delta[0], dislikes=delta[1], created_at=created_at))
+            total = sums.setdefault(video_id, [0, 0])
+            total[0] += delta[0]
+            total[1] += delta[1]
+
+        now = timezone.now()
+        for video_id in video_ids:
+            likes, dislikes = counters.get(video_id, (0, 0))
+            have = sums.get(video_id, [0, 0])
+            if (likes, dislikes) != tuple(have):
+                events.append(ReactionEvent(video_id=video_id, likes=likes - have[0], dislikes=dislikes - have[1], created_at=now))
+
+        ReactionEvent.objects.bulk_create(events, batch_size=1000)
+    return events
+
+
+class Command(BaseCommand):
+    help = "Create the ReactionEvents of reactions made before like changes were recorded, so the rollups can count them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Videos per transaction.')
+
+    def handle(self, *args, **options):
+        created, first = 0, None
+        last_id = 0
+        while True:
+            video_ids = list(
+                VideoMetadata.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:options['batch_size']]
+            )
+            if not video_ids:
+                break
+            events = backfill_batch(video_ids)
+            created += len(events)
+            if events:
+                oldest = min(event.created_at for event in events)
+                first = oldest if first is None else min(first, oldest)
+            last_id = video_ids[-1]
+
+        if not created:
+            self.stdout.write(self.style.SUCCESS("Reaction events already match the like counters."))
+            return
+
+        # The old rollups counted each Like once by status; rebuilding replaces them with the event sums
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {created} reaction event(s). Rebuild the rollups they fall in with:\n"
+            f"    python manage.py rebuild_rollups --from {first.date()} --to {(timezone.now() + timedelta(days=1)).date()}"
+        ))
@@ -0,0 +1,133 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from analytic.benchmarks import summarize, throttles_disabled
+from videos.models import VideoMetadata
+
+User = get_user_model()
+
+PATHS = {
+    'view': ('/analytics/track/view/', '/analytics/async/track/view/'),
+    'engagement': ('/analytics/track/engagement/', '/analytics/async/track/engagement/'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the sync (WSGI) and async (ASGI) tracking endpoints at the same concurrency. In-process by "
+        "default: N threads through the WSGI handler against N in-flight requests on one event loop. With "
+        "--wsgi-url and --asgi-url, N client threads send real HTTP requests to two running servers instead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', choices=sorted(PATHS), default='view')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per run.')
+        parser.add_argument('--concurrency', type=int, default=16, help='Threads (WSGI) and in-flight requests (ASGI).')
+        parser.add_argument('--wsgi-url', help='Base URL of a running WSGI server, e.g. http://127.0.0.1:8000.')
+        parser.add_argument('--asgi-url', help='Base URL of a running ASGI server, e.g. http://127.0.0.1:8001.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        servers = options['wsgi_url'], options['asgi_url']
+        if any(servers) and not all(servers):
+            raise CommandError("Pass both --wsgi-url and --asgi-url to benchmark running servers.")
+
+        user, _ = User.objects.get_or_create(email='bench-ingest@example.com', defaults={'username': 'bench-ingest'})
+        video = VideoMetadata.objects.create(user=user, title='bench-ingest', video_file='bench.mp4', thumbnail_file='bench.png')
+        auth = f'Bearer {RefreshToken.for_user(user).access_token}'
+        payload = {"video_id": video.id, "duration": 42}
+        if options['endpoint'] == 'engagement':
+            payload = {"video_id": video.id, "event_type": "pause", "timestamp": timezone.now().isoformat(), "details": {"position": 3}}
+        sync_path, async_path = PATHS[options['endpoint']]
+        total, concurrency = options['requests'], options['concurrency']
+
+        results = {"endpoint": options['endpoint'], "concurrency": concurrency}
+        try:
+            if all(servers):
+                # The servers apply their own throttles and settings; they must share this database
+                results["mode"] = "http"
+                results["wsgi"] = self._run_threads(total, concurrency, self._http_post(servers[0].rstrip('/') + sync_path, payload, auth))
+                results["asgi"] = self._run_threads(total, concurrency, self._http_post(servers[1].rstrip('/') + async_path, payload, auth))
+            else:
+                results["mode"] = "in-process"
+                with throttles_disabled(), override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                    results["wsgi"] = self._run_threads(total, concurrency, self._client_post(sync_path, payload, auth))
+                    results["asgi"] = asyncio.run(self._run_async(async_path, payload, auth, total, concurrency))
+        finally:
+            video.delete()
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for mode in ('wsgi', 'asgi'):
+            run = results[mode]
+            self.stdout.write(
+                f"{mode.upper()}: {run['requests_per_second']} req/s, p50 {run['p50_ms']} ms, "
+                f"p99 {run['p99_ms']} ms, {run['failures']} failed of {run['requests']}"
+            )
+
+    def _client_post(self, path, payload, auth):
+        """Per-thread sender through the in-process WSGI handler; returns the status code."""
+        def make():
+            client = Client(HTTP_AUTHORIZATION=auth)
+            return lambda: client.post(path, payload, content_type='application/json').status_code
+        return make
+
+    def _http_post(self, url, payload, auth):
+        """Per-thread sender over a keep-alive HTTP session; a connection error counts as a failure."""
+        def make():
+            session = requests.Session()
+            session.headers['Authorization'] = auth
+
+            def post():
+                try:
+                    return session.post(url, json=payload, timeout=30).status_code
+                except requests.RequestException:
+                    return 599
+            return post
+        return make
+
+    def _run_threads(self, total, concurrency, make_post):
+        def worker(count):
+            post = make_post()
+            latencies, failures = [], 0
+            for _ in range(count):
+                started = time.perf_counter()
+                status_code = post()
+                latencies.append(time.perf_counter() - started)
+                failures += status_code >= 400
+            return latencies, failures
+
+        counts = [total // concurrency + (i < total % concurrency) for i in range(concurrency)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            runs = list(pool.map(worker, counts))
+        elapsed = time.perf_counter() - started
+        return summarize([l for latencies, _ in runs for l in latencies], elapsed, sum(f for _, f in runs))
+
+    async def _run_async(self, path, payload, auth, total, concurrency):
+        client = AsyncClient()
+        latencies, failures = [], 0
+        remaining = iter(range(total))
+
+        async def worker():
+            nonlocal failures
+            for _ in remaining:
+                started = time.perf_counter()
+                response = await client.post(path, payload, content_type='application/json', headers={'Authorization': auth})
+                latencies.append(time.perf_counter() - started)
+                failures += response.status_code >= 400
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return summarize(latencies, time.perf_counter() - started, failures)
@@ -0,0 +1,245 @@
+import json
+import random
+from collections import Counter
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from analytic.benchmarks import summarize, throttles_disabled
+from analytic.models import EngagementEvent, ReactionEvent, VideoAnalytics, WatchEvent
+from analytic.rollups import update_rollups
+from engagement.models import Comment, Like
+from users.models import Profile
+from videos.models import VideoMetadata
+
+User = get_user_model()
+
+EMAIL_DOMAIN = 'benchmark.invalid'
+PASSWORD = 'benchmark-password'
+
+
+def _track_view(rng, data):
+    return 'post', '/analytics/track/view/', {"video_id": rng.choice(data['videos']), "duration": rng.randint(1, 600)}
+
+
+def _track_engagement(rng, data):
+    return 'post', '/analytics/track/engagement/', {
+        "video_id": rng.choice(data['videos']),
+        "event_type": rng.choice(['pause', 'resume', 'seek', 'hover']),
+        "timestamp": timezone.now().isoformat(),
+        "details": {"position": rng.uniform(0, 600)},
+    }
+
+
+def _analytics_summary(rng, data):
+    return 'get', f"/analytics/get/analytics/{rng.choice(data['videos'])}/", None
+
+
+def _like(rng, data):
+    return 'post', f"/engage/like/video/{rng.choice(data['videos'])}/", {"is_like": rng.random() < 0.8}
+
+
+def _like_count(rng, data):
+    return 'get', f"/engage/likes/count/{rng.choice(data['videos'])}/", None
+
+
+def _bulk_like_counts(rng, data):
+    # One home feed page of video cards
+    return 'get', '/engage/likes/counts/', {"ids": ','.join(map(str, rng.sample(data['videos'], min(50, len(data['videos'])))))}
+
+
+def _my_reactions(rng, data):
+    return 'get', '/engage/likes/mine/', {"ids": ','.join(map(str, rng.sample(data['videos'], min(50, len(data['videos'])))))}
+
+
+def _comments_list(rng, data):
+    return 'get', '/engage/comments/', {"video": rng.choice(data['videos'])}
+
+
+def _login(rng, data):
+    return 'post', '/account/login/', {"email": rng.choice(data['emails']), "password": PASSWORD}
+
+
+SCENARIOS = {
+    'track_view': _track_view,
+    'track_engagement': _track_engagement,
+    'analytics_summary': _analytics_summary,
+    'like': _like,
+    'like_count': _like_count,
+    'bulk_like_counts': _bulk_like_counts,
+    'my_reactions': _my_reactions,
+    'comments_list': _comments_list,
+    'login': _login,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a benchmark dataset and drive the hot API endpoints with concurrent in-process clients. "
+        "Reports requests/s, p50/p95/p99 latency and SQL queries per request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--videos', type=int, default=200)
+        parser.add_argument('--likes-per-video', type=int, default=20)
+        parser.add_argument('--comments-per-video', type=int, default=10)
+        parser.add_argument('--events-per-video', type=int, default=50, help='Watch and engagement events each.')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per scenario.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent client threads.')
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS), help=f'Comma-separated subset of: {", ".join(SCENARIOS)}.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the dataset and the request mix.')
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded dataset afterwards.')
+
+    def handle(self, *args, **options):
+        scenarios = [name.strip() for name in options['scenarios'].split(',') if name.strip()]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+        self._clear()
+        started = time.perf_counter()
+        data = self._seed(options)
+        self.stderr.write(f"Seeded dataset in {time.perf_counter() - started:.1f}s")
+
+        results = {
+            "started_at": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "view_buffer": settings.ANALYTICS_VIEW_BUFFER_ENABLED,
+            "dataset": {key: options[key] for key in ('users', 'videos', 'likes_per_video', 'comments_per_video', 'events_per_video', 'seed')},
+            "requests": options['requests'],
+            "concurrency": options['concurrency'],
+            "scenarios": {},
+        }
+        try:
+            # The in-process clients send Host: testserver
+            with throttles_disabled(), override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                for name in scenarios:
+                    results["scenarios"][name] = run = self._run(name, data, options)
+                    self.stderr.write(
+                        f"{name:<18} {run['requests_per_second']:>8} req/s  p50 {run['p50_ms']:>8} ms  "
+                        f"p95 {run['p95_ms']:>8} ms  p99 {run['p99_ms']:>8} ms  "
+                        f"{run['queries_per_request']:>6} queries/req  {run['failures']} failed"
+                    )
+        finally:
+            if not options['keep']:
+                self._clear()
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+
+    def _clear(self):
+        # Videos, likes, comments and events go with their users
+        User.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').delete()
+
+    def _seed(self, options):
+        rng = random.Random(options['seed'])
+        password = make_password(PASSWORD)  # hashed once; hashing per user would dominate seeding
+
+        User.objects.bulk_create([
+            User(email=f'user{i}@{EMAIL_DOMAIN}', username=f'bench{i}', password=password)
+            for i in range(options['users'])
+        ])
+        users = list(User.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').order_by('pk'))
+        Profile.objects.bulk_create([Profile(user=user, title=user.username) for user in users])
+
+        VideoMetadata.objects.bulk_create([
+            VideoMetadata(user=rng.choice(users), title=f'Benchmark video {i}', video_file='bench.mp4', thumbnail_file='bench.png')
+            for i in range(options['videos'])
+        ])
+        videos = list(VideoMetadata.objects.filter(user__in=users).values_list('pk', flat=True))
+
+        now = timezone.now()
+        likes, comments, watches, engagements = [], [], [], []
+        counters = {video_id: Counter() for video_id in videos}
+        for video_id in videos:
+            for user in rng.sample(users, min(options['likes_per_video'], len(users))):
+                likes.append(Like(video_id=video_id, user=user, like_status='like' if rng.random() < 0.8 else 'dislike'))
+                counters[video_id][likes[-1].like_status] += 1
+            for _ in range(options['comments_per_video']):
+                comments.append(Comment(video_id=video_id, user=rng.choice(users), comment_text='Benchmark comment'))
+            for _ in range(options['events_per_video']):
+                at = now - timedelta(minutes=rng.randint(10, 60 * 24 * 30))
+                watches.append(WatchEvent(video_id=video_id, user=rng.choice(users), duration=rng.randint(1, 600), created_at=at))
+                engagements.append(EngagementEvent(
+                    video_id=video_id, user=rng.choice(users), event_type=rng.choice(['pause', 'resume', 'seek', 'hover']),
+                    timestamp=at, details={"position": rng.uniform(0, 600)}, created_at=at,
+                ))
+        Like.objects.bulk_create(likes, batch_size=1000)
+        Comment.objects.bulk_create(comments, batch_size=1000)
+        WatchEvent.objects.bulk_create(watches, batch_size=1000)
+        EngagementEvent.objects.bulk_create(engagements, batch_size=1000)
+        VideoAnalytics.objects.bulk_create([
+            VideoAnalytics(
+                video_id=video_id, views=options['events_per_video'],
+                likes=counters[video_id]['like'], dislikes=counters[video_id]['dislike'],
+            )
+            for video_id in videos
+        ], batch_size=1000)
+        ReactionEvent.objects.bulk_create([
+            ReactionEvent(video_id=like.video_id, likes=int(like.like_status == 'like'), dislikes=int(like.like_status == 'dislike'))
+            for like in likes
+        ], batch_size=1000)
+        update_rollups()
+
+        return {
+            'videos': videos,
+            'emails': [user.email for user in users],
+            'tokens': [f'Bearer {RefreshToken.for_user(user).access_token}' for user in users],
+        }
+
+    def _run(self, name, data, options):
+        scenario = SCENARIOS[name]
+        total, concurrency = options['requests'], options['concurrency']
+
+        def worker(index, count):
+            rng = random.Random(f"{options['seed']}:{name}:{index}")
+            client = Client(HTTP_AUTHORIZATION=rng.choice(data['tokens']))
+            latencies, statuses, queries = [], Counter(), 0
+
+            def count_query(execute, sql, params, many, context):
+                nonlocal queries
+                queries += 1
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(count_query):
+                for _ in range(count):
+                    method, path, payload = scenario(rng, data)
+                    started = time.perf_counter()
+                    if method == 'get':
+                        response = client.get(path, payload)
+                    else:
+                        response = client.post(path, payload, content_type='application/json')
+                    latencies.append(time.perf_counter() - started)
+                    statuses[response.status_code] += 1
+            connection.close()  # each worker thread opened its own connection
+            return latencies, statuses, queries
+
+        counts = [total // concurrency + (i < total % concurrency) for i in range(concurrency)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            runs = list(pool.map(worker, range(concurrency), counts))
+        elapsed = time.perf_counter() - started
+        statuses = sum((statuses for _, statuses, _ in runs), Counter())
+        result = summarize(
+            [latency for latencies, _, _ in runs for latency in latencies],
+            elapsed,
+            sum(n for code, n in statuses.items() if code >= 400),
+            queries=sum(queries for _, _, queries in runs),
+        )
+        result["status_codes"] = {str(code): n for code, n in sorted(statuses.items())}
+        return result
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from analytic.retention import update_retention
+
+
+class Command(BaseCommand):
+    help = "Recompute audience-retention curves for videos with new engagement events."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recompute every video with engagement events.')
+
+    def handle(self, *args, **options):
+        updated = update_retention(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(f"Updated retention curves for {updated} video(s)."))
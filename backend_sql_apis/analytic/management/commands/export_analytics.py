@@ -0,0 +1,45 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from analytic.exports import DATASETS, FORMATS, export_rows, stream_export
+
+
+class Command(BaseCommand):
+    help = "Stream an analytics dataset as CSV or NDJSON, in id order, without loading it into memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=list(DATASETS))
+        parser.add_argument('--format', dest='output_format', choices=list(FORMATS), default='csv')
+        parser.add_argument('--from', dest='start', help='ISO date or datetime (inclusive).')
+        parser.add_argument('--to', dest='end', help='ISO date or datetime (exclusive).')
+        parser.add_argument('--after-id', type=int, default=0, help='Resume after this id.')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched per round trip.')
+        parser.add_argument('--output', help='File to write; defaults to stdout.')
+
+    def handle(self, *args, **options):
+        fields, rows = export_rows(
+            options['dataset'],
+            start=self._parse(options['start']),
+            end=self._parse(options['end']),
+            after_id=options['after_id'],
+            chunk_size=options['chunk_size'],
+        )
+
+        out = open(options['output'], 'w', newline='') if options['output'] else sys.stdout
+        try:
+            for chunk in stream_export(fields, rows, options['output_format']):
+                out.write(chunk)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+    def _parse(self, value):
+        if not value:
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise CommandError(f"Invalid date: {value}")
+        return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
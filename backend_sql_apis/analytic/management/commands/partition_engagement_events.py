@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from analytic.models import EngagementEvent
+from analytic.partitions import TABLE, ensure_partitions, is_partitioned
+
+
+class Command(BaseCommand):
+    help = (
+        "Convert the EngagementEvent table into a PostgreSQL table range-partitioned by month on created_at. "
+        "Writes to the table are blocked while rows are copied, so run it in a maintenance window."
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("Declarative partitioning needs PostgreSQL; other databases prune by month range instead.")
+        if is_partitioned():
+            self.stdout.write("Engagement events are already partitioned.")
+            return
+
+        staging = f'{TABLE}_partitioned'
+        legacy = f'{TABLE}_legacy'
+        columns = ', '.join(f'"{field.column}"' for field in EngagementEvent._meta.concrete_fields)
+        oldest = EngagementEvent.objects.aggregate(oldest=Min('created_at'))['oldest'] or timezone.now()
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE "{TABLE}" IN EXCLUSIVE MODE')
+            cursor.execute(
+                f'CREATE TABLE "{staging}" (LIKE "{TABLE}" INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING CONSTRAINTS) '
+                f'PARTITION BY RANGE (created_at)'
+            )
+            # A partitioned table's primary key must contain the partition key
+            cursor.execute(f'ALTER TABLE "{staging}" ADD PRIMARY KEY (id, created_at)')
+            for field in EngagementEvent._meta.concrete_fields:
+                if field.remote_field:
+                    target = field.remote_field.model._meta
+                    cursor.execute(
+                        f'ALTER TABLE "{staging}" ADD FOREIGN KEY ("{field.column}") '
+                        f'REFERENCES "{target.db_table}" ("{target.pk.column}") DEFERRABLE INITIALLY DEFERRED'
+                    )
+            cursor.execute(f'CREATE TABLE "{TABLE}_default" PARTITION OF "{staging}" DEFAULT')
+
+            cursor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{legacy}"')
+            cursor.execute(f'ALTER TABLE "{staging}" RENAME TO "{TABLE}"')
+            created = ensure_partitions(timezone.now(), start=oldest)
+
+            cursor.execute(f'INSERT INTO "{TABLE}" ({columns}) SELECT {columns} FROM "{legacy}"')
+            copied = cursor.rowcount
+            cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence('\"{TABLE}\"', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM \"{TABLE}\""
+            )
+            cursor.execute(f'DROP TABLE "{legacy}"')
+            cursor.execute(f'ALTER INDEX "{staging}_pkey" RENAME TO "{TABLE}_pkey"')
+            # Check the copied foreign keys now; pending checks would block CREATE INDEX
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+            # Recreate the model's indexes under their usual names, now on the partitioned table
+            with connection.schema_editor(atomic=False) as schema_editor:
+                for statement in schema_editor._model_indexes_sql(EngagementEvent):
+                    schema_editor.execute(statement)
+
+        self.stdout.write(self.style.SUCCESS(f"Copied {copied} events into {created} monthly partitions."))
@@ -0,0 +1,21 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analytic.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute hourly and daily analytics rollups for the days in [--from, --to) from raw events."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', type=date.fromisoformat, required=True, help='First day (YYYY-MM-DD).')
+        parser.add_argument('--to', dest='end', type=date.fromisoformat, required=True, help='Day after the last one (YYYY-MM-DD).')
+
+    def handle(self, *args, **options):
+        start, end = options['start'], options['end']
+        if end <= start:
+            raise CommandError("--to must be after --from.")
+
+        days = rebuild_rollups(start, end)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rollups for {days} day(s) from {start} to {end}."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from analytic.reactions import reconcile_like_counts
+
+
+class Command(BaseCommand):
+    help = "Recompute VideoAnalytics.likes and .dislikes from the Like table, one grouped query per batch of videos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Videos per transaction.')
+
+    def handle(self, *args, **options):
+        corrected = reconcile_like_counts(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Corrected like counts of {corrected} video(s)."))
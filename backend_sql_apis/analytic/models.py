@@ -1,15 +1,143 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 from videos.models import VideoMetadata
 
 # Create your models here.
 class VideoAnalytics(models.Model):
     video = models.OneToOneField(VideoMetadata, on_delete=models.CASCADE, related_name="analytics")
-    views = models.IntegerField(default=0)
+    views = models.IntegerField(default=0, db_index=True)
     likes = models.IntegerField(default=0)
     dislikes = models.IntegerField(default=0)
-    watch_time = models.JSONField(default=list, blank=True)  # [{ "user_id": 1, "duration": 120 }, ...]
-    engagements = models.JSONField(default=list, blank=True)  # New field
+    watch_time = models.JSONField(default=list, blank=True)  # Legacy, replaced by WatchEvent (see backfill_analytics_events)
+    engagements = models.JSONField(default=list, blank=True)  # Legacy, replaced by EngagementEvent (see backfill_analytics_events)
 
     def __str__(self):
         return f"Analytics for {self.video.title}"
+
+
+class WatchEvent(models.Model):
+    """One row per tracked view; append-only so recording a view never rewrites older ones."""
+    video = models.ForeignKey(VideoMetadata, on_delete=models.CASCADE, related_name="watch_events")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    duration = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['video', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Watch of video {self.video_id} for {self.duration}s"
+
+
+class EngagementEvent(models.Model):
+    """Player events (pause, resume, seek, hover); one row per event so they can be bulk inserted.
+
+    On PostgreSQL the table can be range-partitioned by month on created_at (see the
+    partition_engagement_events command) so expired months are dropped instead of deleted.
+    """
+    EVENT_TYPE_CHOICES = [
+        ('pause', 'Pause'),
+        ('resume', 'Resume'),
+        ('seek', 'Seek'),
+        ('hover', 'Hover'),
+    ]
+
+    video = models.ForeignKey(VideoMetadata, on_delete=models.CASCADE, related_name="engagement_events")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    event_type = models.CharField(max_length=10, choices=EVENT_TYPE_CHOICES)
+    timestamp = models.DateTimeField()  # Reported by the client
+    details = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)  # Partition key on PostgreSQL
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['video', 'created_at']),
+            models.Index(fields=['event_type', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} on video {self.video_id}"
+
+
+class ReactionEvent(models.Model):
+    """Change of a video's like and dislike counters; append-only, the rollups sum them per hour."""
+    video = models.ForeignKey(VideoMetadata, on_delete=models.CASCADE, related_name="reaction_events")
+    likes = models.IntegerField(default=0)
+    dislikes = models.IntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"Reaction change {self.likes:+d}/{self.dislikes:+d} on video {self.video_id}"
+
+
+class AnalyticsCheckpoint(models.Model):
+    """High-water mark (last processed primary key) of an incremental analytics job."""
+    name = models.CharField(max_length=100, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} at {self.position}"
+
+
+class VideoAnalyticsRollup(models.Model):
+    video = models.ForeignKey(VideoMetadata, on_delete=models.CASCADE, related_name="%(class)s_rows")
+    views = models.IntegerField(default=0)
+    watch_seconds = models.BigIntegerField(default=0)
+    likes = models.IntegerField(default=0)
+    dislikes = models.IntegerField(default=0)
+    pause_events = models.IntegerField(default=0)
+    resume_events = models.IntegerField(default=0)
+    seek_events = models.IntegerField(default=0)
+    hover_events = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class VideoAnalyticsHourly(VideoAnalyticsRollup):
+    bucket = models.DateTimeField(db_index=True)  # Start of the hour (UTC)
+
+    class Meta:
+        unique_together = ('video', 'bucket')
+
+    def __str__(self):
+        return f"Video {self.video_id} at {self.bucket:%Y-%m-%d %H:00}"
+
+
+class VideoAnalyticsDaily(VideoAnalyticsRollup):
+    bucket = models.DateField(db_index=True)
+
+    class Meta:
+        unique_together = ('video', 'bucket')
+
+    def __str__(self):
+        return f"Video {self.video_id} on {self.bucket}"
+
+
+class PlatformAnalyticsTotals(models.Model):
+    """Single row of platform-wide totals, refreshed by the reconcile_analytics_totals task."""
+    total_views = models.BigIntegerField(default=0)
+    total_likes = models.BigIntegerField(default=0)
+    total_dislikes = models.BigIntegerField(default=0)
+    total_watch_time = models.BigIntegerField(default=0)  # seconds
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Platform totals as of {self.updated_at}"
+
+
+class VideoRetention(models.Model):
+    """Audience-retention curve: share of viewers still watching at each percent of the video."""
+    video = models.OneToOneField(VideoMetadata, on_delete=models.CASCADE, related_name="retention")
+    curve = models.BinaryField()  # little-endian uint16 per point, share of viewers * 10000
+    viewers = models.IntegerField(default=0)
+    length = models.FloatField(default=0)  # seconds covered by the curve
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Retention for video {self.video_id}"
@@ -0,0 +1,53 @@
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Values stored by encode_cursor; raises ValueError for a malformed cursor."""
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError("Invalid cursor.") from e
+
+
+def decode_datetime_cursor(cursor):
+    """(datetime, pk) of an encode_cursor([created_at, pk]) cursor; raises ValueError if malformed."""
+    values = decode_cursor(cursor)
+    if not (isinstance(values, list) and len(values) == 2 and isinstance(values[0], str) and type(values[1]) is int):
+        raise ValueError("Invalid cursor.")
+    try:
+        value = parse_datetime(values[0])
+    except ValueError:
+        value = None
+    if value is None:
+        raise ValueError("Invalid cursor.")
+    return value, values[1]
+
+
+def decode_int_cursor(cursor):
+    """(value, pk) of an encode_cursor([count, pk]) cursor; raises ValueError if malformed."""
+    values = decode_cursor(cursor)
+    if not (isinstance(values, list) and len(values) == 2 and all(type(value) is int for value in values)):
+        raise ValueError("Invalid cursor.")
+    return values[0], values[1]
+
+
+def after(field, value, pk, descending=True):
+    """Rows after (value, pk) in (field, pk) order; pk breaks ties so every row appears once."""
+    op = 'lt' if descending else 'gt'
+    return Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'pk__{op}': pk})
+
+
+def get_page_size(request, default=20, maximum=100):
+    try:
+        size = int(request.query_params.get('page_size', default))
+    except ValueError:
+        raise ValueError("'page_size' must be an integer.")
+    return max(1, min(size, maximum))
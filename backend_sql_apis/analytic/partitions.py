@@ -0,0 +1,144 @@
+"""
+Monthly partitions and retention for EngagementEvent.
+
+On PostgreSQL, once partition_engagement_events has converted the table, every calendar month
+of created_at is a partition named <table>_yYYYYmMM, plus a DEFAULT partition as a safety net.
+Expired months are detached and dropped (or moved to the archive schema). Other databases, or
+an unconverted table, use the same month boundaries but delete the rows in chunks, so retention
+behaves the same in local testing.
+
+A month is expired once all of it is older than the longest per-type retention in
+ANALYTICS_ENGAGEMENT_RETENTION_DAYS. Types with shorter retention are pruned row by row.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import EngagementEvent
+
+TABLE = EngagementEvent._meta.db_table
+DELETE_CHUNK = 10000
+
+
+def month_start(moment):
+    return datetime(moment.year, moment.month, 1, tzinfo=dt_timezone.utc)
+
+
+def next_month(start):
+    return datetime(start.year + start.month // 12, start.month % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(start):
+    return f'{TABLE}_y{start.year}m{start.month:02d}'
+
+
+def is_partitioned():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass", [TABLE])
+        return cursor.fetchone() is not None
+
+
+def maintain_partitions(now=None):
+    """Create upcoming partitions, retire expired months and prune short-lived event types."""
+    now = now or timezone.now()
+    created = ensure_partitions(now)
+    retired = retire_expired_months(now)
+    pruned = prune_event_types(now)
+    return created, retired, pruned
+
+
+def ensure_partitions(now, start=None):
+    """Create monthly partitions from start (default: this month) through the configured months ahead."""
+    if not is_partitioned():
+        return 0
+
+    month = month_start(start or now)
+    last = month_start(now)
+    for _ in range(settings.ANALYTICS_ENGAGEMENT_PARTITIONS_AHEAD):
+        last = next_month(last)
+
+    created = 0
+    with connection.cursor() as cursor:
+        existing = _partition_names(cursor)
+        while month <= last:
+            name = partition_name(month)
+            if name not in existing:
+                cursor.execute(
+                    f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{TABLE}" FOR VALUES FROM (%s) TO (%s)',
+                    [month, next_month(month)],
+                )
+                created += 1
+            month = next_month(month)
+    return created
+
+
+def retire_expired_months(now):
+    """Drop (or archive) partitions, or delete rows, for months past every type's retention. Returns months retired."""
+    cutoff = month_start(now - timedelta(days=max(settings.ANALYTICS_ENGAGEMENT_RETENTION_DAYS.values())))
+
+    if not is_partitioned():
+        expired = EngagementEvent.objects.filter(created_at__lt=cutoff)
+        months = expired.annotate(month=TruncMonth('created_at', tzinfo=dt_timezone.utc)).values('month').distinct().count()
+        _delete_in_chunks(expired)
+        return months
+
+    retired = 0
+    with connection.cursor() as cursor:
+        for name in sorted(_partition_names(cursor)):
+            start = _partition_start(name)
+            if start is None or next_month(start) > cutoff:
+                continue
+            with transaction.atomic():
+                cursor.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{name}"')
+                if settings.ANALYTICS_ENGAGEMENT_ARCHIVE_SCHEMA:
+                    schema = settings.ANALYTICS_ENGAGEMENT_ARCHIVE_SCHEMA
+                    cursor.execute(f'CREATE SCHEMA IF NOT EXISTS "{schema}"')
+                    cursor.execute(f'ALTER TABLE "{name}" SET SCHEMA "{schema}"')
+                else:
+                    cursor.execute(f'DROP TABLE "{name}"')
+            retired += 1
+    return retired
+
+
+def prune_event_types(now):
+    """Delete events of types whose retention is shorter than the partition lifetime. Returns rows deleted."""
+    longest = max(settings.ANALYTICS_ENGAGEMENT_RETENTION_DAYS.values())
+    deleted = 0
+    for event_type, days in settings.ANALYTICS_ENGAGEMENT_RETENTION_DAYS.items():
+        if days < longest:
+            deleted += _delete_in_chunks(
+                EngagementEvent.objects.filter(event_type=event_type, created_at__lt=now - timedelta(days=days))
+            )
+    return deleted
+
+
+def _delete_in_chunks(queryset):
+    """Delete in short transactions so pruning never holds long locks."""
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:DELETE_CHUNK])
+        if not ids:
+            return deleted
+        deleted += EngagementEvent.objects.filter(pk__in=ids).delete()[0]
+
+
+def _partition_names(cursor):
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = %s::regclass",
+        [TABLE],
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+
+def _partition_start(name):
+    """Month a partition covers, parsed from its name; None for the default partition."""
+    suffix = name[len(TABLE) + 1:]
+    try:
+        return datetime(int(suffix[1:5]), int(suffix[6:8]), 1, tzinfo=dt_timezone.utc)
+    except ValueError:
+        return None
@@ -0,0 +1,21 @@
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .models import VideoAnalyticsDaily
+
+
+def _per_video(queryset, aggregate):
+    """Correlated subquery aggregating queryset for the outer video, 0 when it has no rows."""
+    totals = queryset.filter(video=OuterRef('pk')).values('video').annotate(total=aggregate).values('total')
+    return Coalesce(Subquery(totals), 0)
+
+
+def with_creator_analytics(videos):
+    """Annotate views, like counts and rolled-up watch time on a VideoMetadata queryset in one query."""
+    return videos.annotate(
+        view_count=Coalesce('analytics__views', 0),
+        like_count=Coalesce('analytics__likes', 0),
+        dislike_count=Coalesce('analytics__dislikes', 0),
+        watch_views=_per_video(VideoAnalyticsDaily.objects.all(), Sum('views')),
+        watch_seconds=_per_video(VideoAnalyticsDaily.objects.all(), Sum('watch_seconds')),
+    )
@@ -0,0 +1,175 @@
+import logging
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from engagement.models import Like
+from videos.models import VideoMetadata
+
+from .models import ReactionEvent, VideoAnalytics
+
+logger = logging.getLogger(__name__)
+
+# VideoAnalytics.likes and .dislikes count the Like rows of each video. LikeVideoAPIView changes
+# them in the same transaction as the reaction itself; reconcile_like_counts repairs drift from
+# anything that bypasses it (admin edits, likes deleted along with their user).
+# Every change, including those repairs, is also written to ReactionEvent for the rollups.
+# Reads go through the default cache, which is invalidated when a change commits.
+
+_COUNTS = {None: (0, 0), 'like': (1, 0), 'dislike': (0, 1)}
+
+
+def adjust_like_counts(video_id, previous, current):
+    """Move one reaction from `previous` to `current` ('like', 'dislike' or None for no reaction).
+
+    Must run in the transaction that changes the Like row.
+    """
+    likes = _COUNTS[current][0] - _COUNTS[previous][0]
+    dislikes = _COUNTS[current][1] - _COUNTS[previous][1]
+    if not likes and not dislikes:
+        return
+
+    counters = VideoAnalytics.objects.filter(video_id=video_id)
+    if not counters.update(likes=F('likes') + likes, dislikes=F('dislikes') + dislikes):
+        VideoAnalytics.objects.bulk_create([VideoAnalytics(video_id=video_id)], ignore_conflicts=True)
+        counters.update(likes=F('likes') + likes, dislikes=F('dislikes') + dislikes)
+    ReactionEvent.objects.create(video_id=video_id, likes=likes, dislikes=dislikes)
+    transaction.on_commit(lambda: invalidate_like_counts([video_id]))
+
+
+def _counts_key(video_id):
+    return f'likes:counts:{video_id}'
+
+
+def get_like_counts(video_ids):
+    """{video_id: (likes, dislikes)} of the videos that exist; cache first, one query for the misses."""
+    keys = {_counts_key(video_id): video_id for video_id in video_ids}
+    try:
+        cached = cache.get_many(keys)
+    except redis.RedisError as e:
+        logger.warning("Like count cache unavailable: %s", e)
+        cached = {}
+    counts = {keys[key]: value for key, value in cached.items()}
+
+    missing = [video_id for video_id in keys.values() if video_id not in counts]
+    if missing:
+        # Videos without a VideoAnalytics row have no reactions yet
+        fetched = {
+            video_id: (likes or 0, dislikes or 0)
+            for video_id, likes, dislikes in (
+                VideoMetadata.objects.filter(id__in=missing).values_list('id', 'analytics__likes', 'analytics__dislikes')
+            )
+        }
+        counts.update(fetched)
+        try:
+            cache.set_many(
+                {_counts_key(video_id): value for video_id, value in fetched.items()},
+                timeout=settings.ANALYTICS_LIKE_COUNTS_CACHE_TTL,
+            )
+        except redis.RedisError as e:
+            logger.warning("Could not cache %d like counts: %s", len(fetched), e)
+    return counts
+
+
+def invalidate_like_counts(video_ids):
+    keys = [_counts_key(video_id) for video_id in video_ids]
+    if not keys:
+        return
+    try:
+        cache.delete_many(keys)
+    except redis.RedisError as e:
+        logger.warning("Could not invalidate %d like counts: %s", len(keys), e)
+
+
+def _reaction_key(user_id, video_id):
+    return f'likes:status:{user_id}:{video_id}'
+
+
+def get_user_reactions(user_id, video_ids):
+    """{video_id: 'like', 'dislike' or None} of one user; cache first, one query for the misses."""
+    keys = {_reaction_key(user_id, video_id): video_id for video_id in video_ids}
+    try:
+        cached = cache.get_many(keys)
+    except redis.RedisError as e:
+        logger.warning("Reaction cache unavailable: %s", e)
+        cached = {}
+    # No reaction is cached as '' so it is a hit too
+    reactions = {keys[key]: value or None for key, value in cached.items()}
+
+    missing = [video_id for video_id in keys.values() if video_id not in reactions]
+    if missing:
+        # One lookup on the (video, user) unique index
+        fetched = dict(Like.objects.filter(user_id=user_id, video_id__in=missing).values_list('video_id', 'like_status'))
+        fetched = {video_id: fetched.get(video_id) for video_id in missing}
+        reactions.update(fetched)
+        try:
+            cache.set_many(
+                {_reaction_key(user_id, video_id): value or '' for video_id, value in fetched.items()},
+                timeout=settings.ANALYTICS_USER_REACTIONS_CACHE_TTL,
+            )
+        except redis.RedisError as e:
+            logger.warning("Could not cache %d reactions: %s", len(fetched), e)
+    return reactions
+
+
+def invalidate_user_reaction(user_id, video_id):
+    try:
+        cache.delete(_reaction_key(user_id, video_id))
+    except redis.RedisError as e:
+        logger.warning("Could not invalidate a cached reaction: %s", e)
+
+
+def reconcile_like_counts(batch_size=1000):
+    """Recompute the counters of every video from Like. Returns the number of videos corrected."""
+    corrected = 0
+    last_id = 0
+    while True:
+        video_ids = list(
+            VideoMetadata.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not video_ids:
+            return corrected
+        corrected += _reconcile_batch(video_ids)
+        last_id = video_ids[-1]
+
+
+def _reconcile_batch(video_ids):
+    with transaction.atomic():
+        # Lock the counters before counting: a reaction committing meanwhile then waits for this
+        # transaction and applies its change on top of the recount instead of being overwritten
+        rows = {
+            row.video_id: row
+            for row in VideoAnalytics.objects.select_for_update().filter(video_id__in=video_ids).only('video_id', 'likes', 'dislikes')
+        }
+        counts = {
+            video_id: (likes, dislikes)
+            for video_id, likes, dislikes in (
+                Like.objects.filter(video_id__in=video_ids)
+                .values('video_id')
+                .annotate(likes=Count('id', filter=Q(like_status='like')), dislikes=Count('id', filter=Q(like_status='dislike')))
+                .values_list('video_id', 'likes', 'dislikes')
+                .order_by()
+            )
+        }
+
+        stale, missing, events = [], [], []
+        for video_id in video_ids:
+            likes, dislikes = counts.get(video_id, (0, 0))
+            row = rows.get(video_id)
+            if row is None:
+                if likes or dislikes:
+                    missing.append(VideoAnalytics(video_id=video_id, likes=likes, dislikes=dislikes))
+                    events.append(ReactionEvent(video_id=video_id, likes=likes, dislikes=dislikes))
+            elif (row.likes, row.dislikes) != (likes, dislikes):
+                events.append(ReactionEvent(video_id=video_id, likes=likes - row.likes, dislikes=dislikes - row.dislikes))
+                row.likes, row.dislikes = likes, dislikes
+                stale.append(row)
+
+        VideoAnalytics.objects.bulk_update(stale, ['likes', 'dislikes'], batch_size=500)
+        VideoAnalytics.objects.bulk_create(missing, ignore_conflicts=True)
+        ReactionEvent.objects.bulk_create(events, batch_size=500)
+    invalidate_like_counts([row.video_id for row in stale + missing])
+    return len(stale) + len(missing)
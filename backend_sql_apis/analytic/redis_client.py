@@ -0,0 +1,51 @@
+import asyncio
+import weakref
+
+import redis
+import redis.asyncio
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+_client = None
+_async_clients = weakref.WeakKeyDictionary()
+_fake_server = None
+
+
+def _fakeredis():
+    global _fake_server
+    try:
+        import fakeredis
+    except ImportError:
+        raise ImproperlyConfigured("Install fakeredis to use a fakeredis:// ANALYTICS_REDIS_URL.")
+    if _fake_server is None:
+        # One in-process server, so the sync and asyncio clients see the same data
+        _fake_server = fakeredis.FakeServer()
+    return fakeredis, _fake_server
+
+
+def get_redis():
+    """Shared Redis client for analytics counters, created once per process."""
+    global _client
+    if _client is None:
+        url = settings.ANALYTICS_REDIS_URL
+        if url.startswith('fakeredis://'):
+            fakeredis, server = _fakeredis()
+            _client = fakeredis.FakeRedis(server=server, decode_responses=True)
+        else:
+            _client = redis.Redis.from_url(url, decode_responses=True)
+    return _client
+
+
+def get_async_redis():
+    """asyncio Redis client for async views; one per event loop, since connections are bound to their loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        url = settings.ANALYTICS_REDIS_URL
+        if url.startswith('fakeredis://'):
+            fakeredis, server = _fakeredis()
+            client = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+        else:
+            client = redis.asyncio.Redis.from_url(url, decode_responses=True)
+        _async_clients[loop] = client
+    return client
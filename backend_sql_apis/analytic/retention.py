@@ -0,0 +1,152 @@
+"""
+Audience-retention curves rebuilt from engagement events.
+
+Clients report playback positions in the event ``details``: ``{"position": s}`` for pause and
+resume, ``{"from": s, "to": s}`` for seek, and optionally ``video_length`` (seconds) and
+``session`` (to tell anonymous viewers apart). A viewer's watch intervals run from the start
+of the video to their first event, and from each resume or seek to their next event.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import AnalyticsCheckpoint, EngagementEvent, VideoRetention
+
+CHECKPOINT = 'retention:engagement'
+POINTS = 100
+PAUSE, RESUME, SEEK = 0, 1, 2
+EVENT_KINDS = {'pause': PAUSE, 'resume': RESUME, 'seek': SEEK}
+
+
+def update_retention(full=False):
+    """Recompute curves of videos with events since the last run (or of every video). Returns videos updated."""
+    checkpoint, _ = AnalyticsCheckpoint.objects.get_or_create(name=CHECKPOINT)
+    position = 0 if full else checkpoint.position
+    cutoff = timezone.now() - timedelta(seconds=settings.ANALYTICS_ROLLUP_LAG)
+
+    new_events = EngagementEvent.objects.filter(pk__gt=position, created_at__lte=cutoff)
+    upper = new_events.aggregate(upper=Max('pk'))['upper']
+    if upper is None:
+        return 0
+
+    video_ids = sorted(set(
+        EngagementEvent.objects.filter(pk__gt=position, pk__lte=upper).values_list('video_id', flat=True).distinct()
+    ))
+    chunk = settings.ANALYTICS_RETENTION_VIDEO_CHUNK
+    for i in range(0, len(video_ids), chunk):
+        _store(compute_curves(video_ids[i:i + chunk]))
+
+    AnalyticsCheckpoint.objects.filter(pk=checkpoint.pk).update(position=upper)
+    return len(video_ids)
+
+
+def compute_curves(video_ids):
+    """{video_id: (curve, viewers, length)} built from every playback event of the given videos."""
+    events = _load_events(video_ids)
+    if events is None:
+        return {}
+    video, viewer, kind, at, before, after, length_hint = events
+
+    # Group each viewer's events in time order
+    order = np.lexsort((at, viewer, video))
+    video, viewer, kind, before, after = video[order], viewer[order], kind[order], before[order], after[order]
+    length_hint = length_hint[order]
+
+    same_viewer_next = (video[1:] == video[:-1]) & (viewer[1:] == viewer[:-1])
+    first = np.r_[True, ~same_viewer_next]
+
+    # Playing from an event until the viewer's next one, unless the event was a pause
+    running = same_viewer_next & (kind[:-1] != PAUSE)
+    seg_video = np.r_[video[:-1][running], video[first]]
+    seg_start = np.r_[after[:-1][running], np.zeros(first.sum())]
+    seg_end = np.r_[before[1:][running], before[first]]
+    valid = seg_end > seg_start
+    seg_video, seg_start, seg_end = seg_video[valid], seg_start[valid], seg_end[valid]
+
+    videos, video_index = np.unique(video, return_inverse=True)
+    viewers = np.bincount(video_index[first], minlength=len(videos))
+
+    # Length of each video: the client hint if any, else the furthest position watched
+    length = np.zeros(len(videos))
+    np.fmax.at(length, video_index, length_hint)
+    seg_index = np.searchsorted(videos, seg_video)
+    np.maximum.at(length, seg_index, seg_end)
+
+    # Count overlapping intervals per point with a difference array
+    scale = (POINTS / np.where(length > 0, length, 1))[seg_index]
+    start_bin = np.clip((seg_start * scale).astype(np.int64), 0, POINTS - 1)
+    end_bin = np.clip(np.ceil(seg_end * scale).astype(np.int64), 1, POINTS)
+    diff = np.zeros((len(videos), POINTS + 1))
+    np.add.at(diff, (seg_index, start_bin), 1)
+    np.add.at(diff, (seg_index, end_bin), -1)
+    watching = np.cumsum(diff, axis=1)[:, :POINTS]
+
+    # Rewatched parts can count a viewer twice, so cap at everyone
+    curves = np.clip(watching / np.maximum(viewers, 1)[:, None], 0, 1)
+    return {
+        int(video_id): (curves[i], int(viewers[i]), float(length[i]))
+        for i, video_id in enumerate(videos)
+    }
+
+
+def decode_curve(data):
+    return (np.frombuffer(bytes(data), dtype='<u2') / 10000).round(4).tolist()
+
+
+def _load_events(video_ids):
+    rows = (
+        EngagementEvent.objects
+        .filter(video_id__in=video_ids, event_type__in=EVENT_KINDS)
+        .values_list('video_id', 'user_id', 'event_type', 'timestamp', 'details')
+        .iterator(chunk_size=5000)
+    )
+
+    # Only unpacking the JSON happens per event; the interval work is done on the arrays
+    viewer_ids = {}
+    records = []
+    for video_id, user_id, event_type, timestamp, details in rows:
+        details = details if isinstance(details, dict) else {}
+        session = details.get('session')
+        viewer = ('session', str(session)) if session else ('user', user_id)
+        if viewer[1] is None:
+            continue  # anonymous events without a session can't be joined into intervals
+        try:
+            if event_type == 'seek':
+                before, after = float(details['from']), float(details['to'])
+            else:
+                before = after = float(details['position'])
+            length = float(details.get('video_length') or 'nan')
+        except (KeyError, TypeError, ValueError):
+            continue
+        viewer_id = viewer_ids.setdefault(viewer, len(viewer_ids))
+        records.append((video_id, viewer_id, EVENT_KINDS[event_type], timestamp.timestamp(), before, after, length))
+
+    if not records:
+        return None
+    table = np.array(records, dtype=[
+        ('video', 'i8'), ('viewer', 'i8'), ('kind', 'i1'), ('at', 'f8'), ('before', 'f8'), ('after', 'f8'), ('length', 'f8'),
+    ])
+    return tuple(table[name] for name in table.dtype.names)
+
+
+def _store(curves):
+    now = timezone.now()
+    rows = [
+        VideoRetention(
+            video_id=video_id,
+            curve=np.round(curve * 10000).astype('<u2').tobytes(),
+            viewers=viewers,
+            length=length,
+            computed_at=now,
+        )
+        for video_id, (curve, viewers, length) in curves.items()
+    ]
+    VideoRetention.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['video'],
+        update_fields=['curve', 'viewers', 'length', 'computed_at'],
+    )
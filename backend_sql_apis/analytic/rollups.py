@@ -0,0 +1,161 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from .models import AnalyticsCheckpoint, EngagementEvent, ReactionEvent, VideoAnalyticsDaily, VideoAnalyticsHourly, WatchEvent
+
+
+def _watch_deltas(queryset):
+    return (
+        queryset
+        .values('video_id', hour=TruncHour('created_at'))
+        .annotate(views=Count('id'), watch_seconds=Sum('duration'))
+    )
+
+
+def _engagement_deltas(queryset):
+    counts = {
+        f'{event_type}_events': Count('id', filter=Q(event_type=event_type))
+        for event_type, _ in EngagementEvent.EVENT_TYPE_CHOICES
+    }
+    return queryset.values('video_id', hour=TruncHour('created_at')).annotate(**counts)
+
+
+def _reaction_deltas(queryset):
+    # Net change in the hour: a flip or a removed reaction counts against the hour it happened in
+    return (
+        queryset
+        .values('video_id', hour=TruncHour('created_at'))
+        .annotate(likes=Sum('likes'), dislikes=Sum('dislikes'))
+    )
+
+
+# (checkpoint name, raw source, aggregation into per-video hourly deltas)
+SOURCES = [
+    ('rollup:watch', WatchEvent, _watch_deltas),
+    ('rollup:engagement', EngagementEvent, _engagement_deltas),
+    ('rollup:reaction', ReactionEvent, _reaction_deltas),
+]
+
+
+def update_rollups(batch_size=None):
+    """Fold raw rows added since the last run into the rollup tables. Returns the number of rows processed."""
+    batch_size = batch_size or settings.ANALYTICS_ROLLUP_BATCH_SIZE
+    # Rows from transactions still in flight may commit with a lower id than rows already
+    # visible, so only rows older than the lag are allowed to move the high-water mark.
+    cutoff = timezone.now() - timedelta(seconds=settings.ANALYTICS_ROLLUP_LAG)
+    processed = 0
+
+    for name, model, aggregate in SOURCES:
+        while True:
+            with transaction.atomic():
+                checkpoint = _lock_checkpoint(name)
+                ids = list(
+                    model.objects
+                    .filter(pk__gt=checkpoint.position, created_at__lte=cutoff)
+                    .order_by('pk')
+                    .values_list('pk', flat=True)[:batch_size]
+                )
+                if not ids:
+                    break
+
+                _apply(aggregate(model.objects.filter(pk__gt=checkpoint.position, pk__lte=ids[-1])))
+                checkpoint.position = ids[-1]
+                checkpoint.save(update_fields=['position', 'updated_at'])
+            processed += len(ids)
+
+    return processed
+
+
+def rebuild_rollups(start, end):
+    """Recompute the rollups of every day in [start, end) from raw rows. Returns the number of days rebuilt."""
+    day = start
+    while day < end:
+        day_start = datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+        day_end = day_start + timedelta(days=1)
+
+        with transaction.atomic():
+            # Rows past the high-water marks are left for update_rollups so nothing is counted twice
+            positions = {name: _lock_checkpoint(name).position for name, _, _ in SOURCES}
+            VideoAnalyticsHourly.objects.filter(bucket__gte=day_start, bucket__lt=day_end).delete()
+            VideoAnalyticsDaily.objects.filter(bucket=day).delete()
+            for name, model, aggregate in SOURCES:
+                _apply(aggregate(model.objects.filter(
+                    pk__lte=positions[name], created_at__gte=day_start, created_at__lt=day_end
+                )))
+
+        day += timedelta(days=1)
+
+    return (end - start).days
+
+
+def average_watch_time(video_id):
+    totals = VideoAnalyticsDaily.objects.filter(video_id=video_id).aggregate(
+        views=Sum('views'), watch_seconds=Sum('watch_seconds')
+    )
+    if not totals['views']:
+        return 0
+    return totals['watch_seconds'] / totals['views']
+
+
+def total_watch_seconds():
+    """Watch time of every view: the daily rollups plus the raw events past the rollup:watch mark."""
+    with transaction.atomic():
+        # Holding the checkpoint keeps update_rollups from moving rows between the two sums
+        position = _lock_checkpoint('rollup:watch').position
+        rolled_up = VideoAnalyticsDaily.objects.aggregate(total=Sum('watch_seconds'))['total'] or 0
+        pending = WatchEvent.objects.filter(pk__gt=position).aggregate(total=Sum('duration'))['total'] or 0
+    return rolled_up + pending
+
+
+def _lock_checkpoint(name):
+    AnalyticsCheckpoint.objects.get_or_create(name=name)
+    return AnalyticsCheckpoint.objects.select_for_update().get(name=name)
+
+
+def _apply(rows):
+    hourly = defaultdict(lambda: defaultdict(int))
+    daily = defaultdict(lambda: defaultdict(int))
+    for row in rows:
+        video_id = row.pop('video_id')
+        hour = row.pop('hour')
+        for field, value in row.items():
+            hourly[(video_id, hour)][field] += value or 0
+            daily[(video_id, hour.date())][field] += value or 0
+
+    _merge(VideoAnalyticsHourly, hourly)
+    _merge(VideoAnalyticsDaily, daily)
+
+
+def _merge(model, deltas):
+    if not deltas:
+        return
+
+    existing = {
+        (row.video_id, row.bucket): row
+        for row in model.objects.filter(
+            video_id__in={video_id for video_id, _ in deltas},
+            bucket__in={bucket for _, bucket in deltas},
+        )
+    }
+
+    to_create, to_update, fields = [], [], set()
+    for (video_id, bucket), delta in deltas.items():
+        row = existing.get((video_id, bucket))
+        if row is None:
+            row = model(video_id=video_id, bucket=bucket)
+            to_create.append(row)
+        else:
+            to_update.append(row)
+        for field, value in delta.items():
+            setattr(row, field, getattr(row, field) + value)
+            fields.add(field)
+
+    model.objects.bulk_create(to_create, batch_size=500)
+    if to_update:
+        model.objects.bulk_update(to_update, list(fields), batch_size=500)
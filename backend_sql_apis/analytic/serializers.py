@@ -1,32 +1,59 @@
-from analytic.models import VideoAnalytics
 from rest_framework import serializers
 
+from analytic.models import EngagementEvent, VideoAnalytics
+from analytic.retention import decode_curve
+from analytic.rollups import average_watch_time
+
 class TrackViewSerializer(serializers.Serializer):
     video_id = serializers.CharField()
     duration = serializers.IntegerField(min_value=0)
+    event_id = serializers.CharField(max_length=64, required=False)  # Client id for retries; duplicates are ignored
 
 class EngagementSerializer(serializers.Serializer):
     video_id = serializers.IntegerField()
-    event_type = serializers.ChoiceField(choices=["pause", "resume", "seek", "hover"])
+    event_type = serializers.ChoiceField(choices=EngagementEvent.EVENT_TYPE_CHOICES)
     timestamp = serializers.DateTimeField()
     details = serializers.DictField(required=False)  # Optional extra data
+    event_id = serializers.CharField(max_length=64, required=False)  # Client id for retries; duplicates are ignored
 
 
-class VideoAnalyticsSummarySerializer(serializers.Serializer):
-    video_id = serializers.IntegerField()
+class SeriesPointSerializer(serializers.Serializer):
+    bucket = serializers.CharField()  # ISO start of the hour, day or week (UTC)
     views = serializers.IntegerField()
+    watch_seconds = serializers.IntegerField()
     likes = serializers.IntegerField()
     dislikes = serializers.IntegerField()
-    average_watch_time = serializers.FloatField()
 
 
-class UserVideoAnalyticsSerializer(serializers.Serializer):
+class VideoSummarySerializer(serializers.Serializer):
     video_id = serializers.IntegerField()
-    title = serializers.CharField()
     views = serializers.IntegerField()
     likes = serializers.IntegerField()
     dislikes = serializers.IntegerField()
     average_watch_time = serializers.FloatField()
+    watch_time_percentiles = serializers.DictField(child=serializers.FloatField(), allow_null=True)
+    unique_viewers = serializers.IntegerField(allow_null=True)
+    unique_viewers_from = serializers.DateField()
+    unique_viewers_to = serializers.DateField()
+    granularity = serializers.CharField(required=False)
+    series = SeriesPointSerializer(many=True, required=False)  # only with ?granularity=
+
+
+class UserVideoAnalyticsSerializer(serializers.Serializer):
+    video_id = serializers.CharField(source='id')
+    video_title = serializers.CharField(source='title', allow_null=True)
+    created_at = serializers.DateTimeField()
+    views = serializers.IntegerField(source='view_count')
+    likes = serializers.IntegerField(source='like_count')
+    dislikes = serializers.IntegerField(source='dislike_count')
+    avg_watch_time = serializers.SerializerMethodField()
+    watch_time_percentiles = serializers.SerializerMethodField()
+
+    def get_avg_watch_time(self, obj):
+        return obj.watch_seconds / obj.watch_views if obj.watch_views else 0
+
+    def get_watch_time_percentiles(self, obj):
+        return self.context.get('percentiles', {}).get(obj.pk)
 
 
 class VideoAnalyticsSummarySerializer(serializers.ModelSerializer):
@@ -37,10 +64,7 @@ class VideoAnalyticsSummarySerializer(serializers.ModelSerializer):
         fields = ['views', 'likes', 'dislikes', 'avg_watch_time']
 
     def get_avg_watch_time(self, obj):
-        durations = [entry['duration'] for entry in obj.watch_time if 'duration' in entry]
-        if durations:
-            return sum(durations) / len(durations)
-        return 0
+        return average_watch_time(obj.video_id)
 
 
 class AdminAnalyticsOverviewSerializer(serializers.Serializer):
@@ -49,3 +73,40 @@ class AdminAnalyticsOverviewSerializer(serializers.Serializer):
     total_dislikes = serializers.IntegerField()
     total_watch_time = serializers.FloatField()
     trending_videos = serializers.ListField(child=serializers.DictField())
+
+
+class DedupeWindowSerializer(serializers.Serializer):
+    window_start = serializers.IntegerField()  # Unix time
+    items = serializers.IntegerField()
+    duplicates = serializers.IntegerField()
+    memory_bytes = serializers.IntegerField()
+    fill_ratio = serializers.FloatField()
+    false_positive_rate = serializers.FloatField()
+
+
+class DedupeStatsSerializer(serializers.Serializer):
+    window_seconds = serializers.IntegerField()
+    capacity = serializers.IntegerField()
+    target_error_rate = serializers.FloatField()
+    bits = serializers.IntegerField()
+    hashes = serializers.IntegerField()
+    memory_bytes = serializers.IntegerField()
+    false_positive_rate = serializers.FloatField()
+    windows = DedupeWindowSerializer(many=True)
+
+
+class TrendingVideoSerializer(serializers.Serializer):
+    video_id = serializers.IntegerField()
+    title = serializers.CharField(allow_null=True)
+    score = serializers.FloatField()
+
+
+class VideoRetentionSerializer(serializers.Serializer):
+    video_id = serializers.IntegerField()
+    viewers = serializers.IntegerField()
+    length = serializers.FloatField()
+    computed_at = serializers.DateTimeField()
+    curve = serializers.SerializerMethodField()
+
+    def get_curve(self, obj):
+        return decode_curve(obj.curve)
@@ -0,0 +1,81 @@
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Sum
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import VideoAnalyticsDaily, VideoAnalyticsHourly
+
+# Time series are served from the rollup tables: hour from VideoAnalyticsHourly, day and week
+# from VideoAnalyticsDaily. Both are indexed on (video, bucket), so a year of daily points for
+# a video is one index range scan of ~365 rows.
+
+GRANULARITIES = ('hour', 'day', 'week')
+METRICS = ('views', 'watch_seconds', 'likes', 'dislikes')
+STEPS = {'hour': timedelta(hours=1), 'day': timedelta(days=1), 'week': timedelta(weeks=1)}
+
+
+def get_date_range(request, default_days=30):
+    """Inclusive (from, to) dates from ?from=..&to=.., by default the last `default_days` days.
+
+    Raises ValueError with a message fit for a 400 response.
+    """
+    end = _parse_date_param(request, 'to') or timezone.now().date()
+    start = _parse_date_param(request, 'from') or end - timedelta(days=default_days - 1)
+    if start > end:
+        raise ValueError("'from' must not be after 'to'.")
+    return start, end
+
+
+def _parse_date_param(request, name):
+    """The date in ?name=, or None when it is not given."""
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None  # well formed but not a real date, e.g. 2025-02-30
+    if parsed is None:
+        raise ValueError("'from' and 'to' must be dates (YYYY-MM-DD).")
+    return parsed
+
+
+def get_series(start, end, granularity, **filters):
+    """Metrics summed per bucket between the dates start and end (inclusive, UTC), gaps filled with zeros.
+
+    `filters` select the videos, e.g. video_id=1 or video__user=user.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"'granularity' must be one of {list(GRANULARITIES)}.")
+
+    if granularity == 'hour':
+        first = datetime.combine(start, time.min, tzinfo=dt_timezone.utc)
+        last = datetime.combine(end, time(23), tzinfo=dt_timezone.utc)
+        rows, bucket = VideoAnalyticsHourly.objects.filter(bucket__range=(first, last)), 'bucket'
+    else:
+        rows, bucket = VideoAnalyticsDaily.objects.filter(bucket__range=(start, end)), 'bucket'
+        first, last = start, end
+        if granularity == 'week':
+            # date_trunc('week') on PostgreSQL: weeks start on Monday
+            rows, bucket = rows.annotate(week=TruncWeek('bucket')), 'week'
+            first, last = start - timedelta(days=start.weekday()), end - timedelta(days=end.weekday())
+
+    step = STEPS[granularity]
+    if (last - first) // step + 1 > settings.ANALYTICS_SERIES_MAX_POINTS:
+        raise ValueError(f"Range too long for granularity '{granularity}' (max {settings.ANALYTICS_SERIES_MAX_POINTS} points).")
+
+    totals = {
+        row[bucket]: row
+        for row in rows.filter(**filters).values(bucket).order_by(bucket).annotate(**{metric: Sum(metric) for metric in METRICS})
+    }
+
+    series = []
+    current = first
+    while current <= last:
+        row = totals.get(current, {})
+        series.append({'bucket': current.isoformat(), **{metric: row.get(metric) or 0 for metric in METRICS}})
+        current += step
+    return series
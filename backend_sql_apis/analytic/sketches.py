@@ -0,0 +1,146 @@
+import hashlib
+import logging
+import math
+from datetime import timedelta
+
+import redis
+from django.conf import settings
+from django.utils import timezone
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+# Unique viewers: one Redis HyperLogLog per video per day. Each is at most 12 KB whatever the
+# number of viewers, and PFCOUNT over several days merges them (~0.8% standard error).
+
+def _viewers_key(video_id, day):
+    return f'analytics:uv:{video_id}:{day:%Y%m%d}'
+
+
+def viewer_id(request):
+    """Authenticated user id, or a salted hash of the client address and user agent."""
+    if request.user.is_authenticated:
+        return f'u:{request.user.id}'
+    fingerprint = '|'.join([
+        settings.SECRET_KEY,
+        request.META.get('REMOTE_ADDR', ''),
+        request.META.get('HTTP_USER_AGENT', ''),
+    ])
+    return 'a:' + hashlib.sha256(fingerprint.encode()).hexdigest()[:32]
+
+
+def queue_viewer(pipe, video_id, viewer, day=None):
+    """Add the viewer-recording commands to a (sync or asyncio) pipeline."""
+    key = _viewers_key(video_id, day or timezone.now().date())
+    pipe.pfadd(key, viewer)
+    pipe.expire(key, timedelta(days=settings.ANALYTICS_UNIQUE_VIEWERS_RETENTION_DAYS))
+
+
+def record_viewer(video_id, viewer, day=None):
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        queue_viewer(pipe, video_id, viewer, day)
+        pipe.execute()
+    except redis.RedisError:
+        logger.warning("Could not record viewer for video %s", video_id, exc_info=True)
+
+
+def unique_viewers(video_id, start, end):
+    """Approximate distinct viewers of a video over the days in [start, end], or None if Redis is unavailable."""
+    keys = [_viewers_key(video_id, start + timedelta(days=i)) for i in range((end - start).days + 1)]
+    if not keys:
+        return 0
+    try:
+        return get_redis().pfcount(*keys)
+    except redis.RedisError:
+        logger.warning("Could not count viewers for video %s", video_id, exc_info=True)
+        return None
+
+
+# Watch-time percentiles: a log-bucketed histogram per video and per creator, kept as Redis hashes
+# of bucket -> count. Buckets grow by WATCH_TIME_GAMMA, so any percentile is within ~2.5% of the
+# exact value, a histogram never has more than ~235 buckets, and histograms merge by adding counts.
+
+WATCH_TIME_GAMMA = 1.05
+MAX_WATCH_SECONDS = 24 * 3600
+PERCENTILES = (('p50', 0.5), ('p90', 0.9), ('p99', 0.99))
+
+
+def _video_watch_key(video_id):
+    return f'analytics:wt:video:{video_id}'
+
+
+def _creator_watch_key(user_id):
+    return f'analytics:wt:creator:{user_id}'
+
+
+def _watch_bucket(duration):
+    duration = min(duration, MAX_WATCH_SECONDS)
+    if duration < 1:
+        return 0
+    return 1 + int(math.log(duration) / math.log(WATCH_TIME_GAMMA))
+
+
+def _bucket_value(bucket):
+    if bucket == 0:
+        return 0.0
+    # Geometric middle of [gamma^(b-1), gamma^b)
+    return WATCH_TIME_GAMMA ** (bucket - 0.5)
+
+
+def queue_watch_time(pipe, video_id, creator_id, duration):
+    bucket = _watch_bucket(duration)
+    pipe.hincrby(_video_watch_key(video_id), bucket, 1)
+    pipe.hincrby(_creator_watch_key(creator_id), bucket, 1)
+
+
+def record_watch_time(video_id, creator_id, duration):
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        queue_watch_time(pipe, video_id, creator_id, duration)
+        pipe.execute()
+    except redis.RedisError:
+        logger.warning("Could not record watch time for video %s", video_id, exc_info=True)
+
+
+def percentiles(counts):
+    """p50/p90/p99 in seconds from a {bucket: count} histogram, or None when it is empty."""
+    histogram = sorted((int(bucket), int(n)) for bucket, n in counts.items())
+    total = sum(n for _, n in histogram)
+    if not total:
+        return None
+
+    result = {}
+    for name, q in PERCENTILES:
+        rank = q * total
+        seen = 0
+        for bucket, n in histogram:
+            seen += n
+            if seen >= rank:
+                result[name] = round(_bucket_value(bucket), 1)
+                break
+    return result
+
+
+def video_watch_percentiles(video_ids):
+    """{video_id: percentiles} for several videos in one round trip; empty if Redis is unavailable."""
+    video_ids = list(video_ids)
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for video_id in video_ids:
+            pipe.hgetall(_video_watch_key(video_id))
+        histograms = pipe.execute()
+    except redis.RedisError:
+        logger.warning("Could not read watch-time histograms", exc_info=True)
+        return {}
+    return {video_id: percentiles(counts) for video_id, counts in zip(video_ids, histograms)}
+
+
+def creator_watch_percentiles(user_id):
+    try:
+        return percentiles(get_redis().hgetall(_creator_watch_key(user_id)))
+    except redis.RedisError:
+        logger.warning("Could not read watch-time histogram for creator %s", user_id, exc_info=True)
+        return None
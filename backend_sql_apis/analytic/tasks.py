@@ -0,0 +1,44 @@
+from celery import shared_task
+
+from .buffer import flush_views
+from .partitions import maintain_partitions
+from .retention import update_retention
+from .trending import rebuild_scores
+from .rollups import update_rollups
+from .totals import reconcile_totals
+
+
+@shared_task
+def flush_view_buffer():
+    flushed = flush_views()
+    return f"Flushed {flushed} buffered views"
+
+
+@shared_task
+def update_analytics_rollups():
+    processed = update_rollups()
+    return f"Rolled up {processed} analytics rows"
+
+
+@shared_task
+def reconcile_analytics_totals():
+    totals = reconcile_totals()
+    return f"Platform totals: {totals.total_views} views, {totals.total_watch_time}s watched"
+
+
+@shared_task
+def rebuild_trending_scores():
+    scored = rebuild_scores()
+    return f"Rebuilt trending scores for {scored} videos"
+
+
+@shared_task
+def update_retention_curves():
+    updated = update_retention()
+    return f"Updated retention curves for {updated} videos"
+
+
+@shared_task
+def maintain_engagement_partitions():
+    created, retired, pruned = maintain_partitions()
+    return f"Created {created} partitions, retired {retired} months, pruned {pruned} events"
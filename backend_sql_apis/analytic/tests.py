@@ -1,3 +1,524 @@
-from django.test import TestCase
+import base64
+import csv
+import io
+import json
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import redis
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from engagement.models import Like
+from users.models import CustomUser
+from videos.models import VideoMetadata
+
+from . import buffer, cache, exports, partitions, retention
+from .models import EngagementEvent, ReactionEvent, VideoAnalytics, VideoAnalyticsHourly, VideoRetention, WatchEvent
+from .redis_client import get_redis
+from .rollups import update_rollups
+from .totals import reconcile_totals
+
+
+@override_settings(ANALYTICS_VIEW_BUFFER_ENABLED=False)
+class EventIdRetryTests(TestCase):
+    """A request that fails must not make its event_id a duplicate, or the retry is dropped."""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='viewer@example.com', password='pw', username='viewer')
+        self.video = VideoMetadata.objects.create(user=self.user, title='t', video_file='v.mp4', thumbnail_file='t.png')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.event_id = uuid.uuid4().hex
+
+    def test_view_retried_after_failed_write_is_recorded(self):
+        payload = {"video_id": self.video.id, "duration": 5, "event_id": self.event_id}
+        with mock.patch('analytic.views.trending.record') as record, mock.patch('analytic.views.sketches.record_watch_time') as watch_time:
+            with mock.patch.object(WatchEvent.objects, 'create', side_effect=DatabaseError("write failed")):
+                response = self.client.post('/analytics/track/view/', payload, format='json')
+            self.assertEqual(response.status_code, 500)
+            self.assertEqual((record.call_count, watch_time.call_count), (0, 0))
+
+            response = self.client.post('/analytics/track/view/', payload, format='json')
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn("duplicate", response.data)
+            self.assertEqual(WatchEvent.objects.filter(video=self.video).count(), 1)
+            self.assertEqual((record.call_count, watch_time.call_count), (1, 1))
+
+        response = self.client.post('/analytics/track/view/', payload, format='json')
+        self.assertTrue(response.data["duplicate"])
+        self.assertEqual(WatchEvent.objects.filter(video=self.video).count(), 1)
+
+    def test_engagement_retried_after_failed_write_is_recorded(self):
+        payload = {"video_id": self.video.id, "event_type": "pause", "timestamp": "2025-01-01T00:00:00Z", "event_id": self.event_id}
+        with mock.patch.object(EngagementEvent.objects, 'create', side_effect=DatabaseError("write failed")):
+            response = self.client.post('/analytics/track/engagement/', payload, format='json')
+        self.assertEqual(response.status_code, 500)
+
+        response = self.client.post('/analytics/track/engagement/', payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("duplicate", response.data)
+        self.assertEqual(EngagementEvent.objects.filter(video=self.video).count(), 1)
+
+    def test_batch_retried_after_failed_write_is_recorded(self):
+        events = [
+            {"video_id": self.video.id, "event_type": "seek", "timestamp": "2025-01-01T00:00:00Z", "event_id": self.event_id},
+            {"video_id": self.video.id, "event_type": "seek", "timestamp": "2025-01-01T00:00:00Z", "event_id": self.event_id},
+        ]
+        with mock.patch.object(EngagementEvent.objects, 'bulk_create', side_effect=DatabaseError("write failed")):
+            response = self.client.post('/analytics/track/engagement/batch/', events, format='json')
+        self.assertEqual(response.status_code, 500)
+
+        response = self.client.post('/analytics/track/engagement/batch/', events, format='json')
+        self.assertEqual((response.data["accepted"], response.data["duplicates"]), (1, 1))
+        self.assertEqual(EngagementEvent.objects.filter(video=self.video).count(), 1)
+
+    async def test_async_view_retried_after_failed_write_is_recorded(self):
+        headers = {"Authorization": f"Bearer {RefreshToken.for_user(self.user).access_token}"}
+        payload = {"video_id": self.video.id, "duration": 5, "event_id": self.event_id}
+        with mock.patch('analytic.async_views.trending.queue_record') as record:
+            with mock.patch('analytic.async_views._count_view', side_effect=DatabaseError("write failed")):
+                response = await self.async_client.post('/analytics/async/track/view/', payload, content_type='application/json', headers=headers)
+            self.assertEqual(response.status_code, 500)
+            self.assertEqual(record.call_count, 0)
+
+            response = await self.async_client.post('/analytics/async/track/view/', payload, content_type='application/json', headers=headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn("duplicate", response.json())
+            self.assertEqual(await WatchEvent.objects.filter(video=self.video).acount(), 1)
+            self.assertEqual(record.call_count, 1)
+
+
+@override_settings(ANALYTICS_ROLLUP_LAG=0)
+class PlatformTotalsTests(TestCase):
+    def test_watch_time_counts_rolled_up_and_pending_events_once(self):
+        user = CustomUser.objects.create_user(email='viewer@example.com', password='pw', username='viewer')
+        video = VideoMetadata.objects.create(user=user, title='t', video_file='v.mp4', thumbnail_file='t.png')
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        WatchEvent.objects.bulk_create([WatchEvent(video=video, duration=10, created_at=an_hour_ago) for _ in range(3)])
+        update_rollups()
+        WatchEvent.objects.create(video=video, duration=7)  # not rolled up yet
+
+        self.assertEqual(reconcile_totals().total_watch_time, 37)
+        update_rollups()
+        self.assertEqual(reconcile_totals().total_watch_time, 37)
+
+
+@override_settings(ANALYTICS_ROLLUP_LAG=0)
+class ReactionRollupTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='fan@example.com', password='pw', username='fan')
+        self.video = VideoMetadata.objects.create(user=self.user, title='t', video_file='v.mp4', thumbnail_file='t.png')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _rolled_up(self):
+        update_rollups()
+        totals = VideoAnalyticsHourly.objects.filter(video=self.video).aggregate(likes=Sum('likes'), dislikes=Sum('dislikes'))
+        return totals['likes'] or 0, totals['dislikes'] or 0
+
+    def _counters(self):
+        return VideoAnalytics.objects.values_list('likes', 'dislikes').get(video=self.video)
+
+    def test_flips_and_removals_reach_the_rollups(self):
+        url = f'/engage/like/video/{self.video.id}/'
+        self.client.post(url, {'is_like': True}, format='json')
+        self.assertEqual(self._rolled_up(), (1, 0))
+
+        self.client.post(url, {'is_like': False}, format='json')
+        self.assertEqual(self._rolled_up(), (0, 1))
+        self.assertEqual(self._rolled_up(), self._counters())
+
+        self.client.delete(url)
+        self.assertEqual(self._rolled_up(), (0, 0))
+        self.assertEqual(self._rolled_up(), self._counters())
+
+    def test_backfill_matches_the_counters_once(self):
+        fans = [CustomUser.objects.create_user(email=f'f{i}@example.com', password='pw', username=f'f{i}') for i in range(3)]
+        Like.objects.bulk_create([Like(video=self.video, user=fan, like_status=status) for fan, status in zip(fans, ['like', 'like', 'dislike'])])
+        # One of the likes was flipped to a dislike after the counters were set
+        VideoAnalytics.objects.create(video=self.video, likes=1, dislikes=2)
+
+        call_command('backfill_reaction_events', stdout=mock.Mock())
+        events = ReactionEvent.objects.filter(video=self.video).aggregate(likes=Sum('likes'), dislikes=Sum('dislikes'))
+        self.assertEqual((events['likes'], events['dislikes']), (1, 2))
+
+        count = ReactionEvent.objects.count()
+        call_command('backfill_reaction_events', stdout=mock.Mock())
+        self.assertEqual(ReactionEvent.objects.count(), count)
+
+
+class ViewFlushTests(TestCase):
+    def setUp(self):
+        user = CustomUser.objects.create_user(email='viewer@example.com', password='pw', username='viewer')
+        self.videos = [
+            VideoMetadata.objects.create(user=user, title=f'v{i}', video_file='v.mp4', thumbnail_file='t.png') for i in range(3)
+        ]
+        self.redis = get_redis()
+        self.redis.delete(buffer.PENDING_KEY, buffer.CLAIMED_KEY, buffer.BATCH_KEY, buffer.SEQUENCE_KEY, buffer.LOCK_KEY)
+        for video in self.videos:
+            buffer.buffer_view(video.id, 2)
+
+    def _views(self):
+        return sorted(VideoAnalytics.objects.values_list('views', flat=True))
+
+    def test_flush_that_dies_after_commit_does_not_count_twice(self):
+        apply_counts = buffer._apply_counts
+
+        def commit_then_die(counts, batch_id):
+            apply_counts(counts, batch_id)
+            raise redis.ConnectionError("worker lost Redis")
+
+        with mock.patch('analytic.buffer._apply_counts', side_effect=commit_then_die):
+            with self.assertRaises(redis.ConnectionError):
+                buffer.flush_views(batch_size=10)
+        self.redis.delete(buffer.LOCK_KEY)  # the dead worker's lock expires
+
+        self.assertEqual(buffer.flush_views(batch_size=10), 0)
+        self.assertEqual(self._views(), [2, 2, 2])
+        buffer.buffer_view(self.videos[0].id)
+        self.assertEqual(buffer.flush_views(batch_size=10), 1)
+        self.assertEqual(self._views(), [2, 2, 3])
+
+    def test_expired_lock_does_not_fail_the_flush(self):
+        apply_counts = buffer._apply_counts
+
+        def expire_lock(counts, batch_id):
+            self.redis.delete(buffer.LOCK_KEY)
+            return apply_counts(counts, batch_id)
+
+        with mock.patch('analytic.buffer._apply_counts', side_effect=expire_lock):
+            self.assertEqual(buffer.flush_views(batch_size=10), 6)
+        self.assertEqual(self._views(), [2, 2, 2])
+
+
+@override_settings(ANALYTICS_VIEW_BUFFER_ENABLED=True)
+class BufferedViewRetryTests(TestCase):
+    """A buffered view is counted in Redis only together with its WatchEvent."""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='viewer@example.com', password='pw', username='viewer')
+        self.video = VideoMetadata.objects.create(user=self.user, title='t', video_file='v.mp4', thumbnail_file='t.png')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.redis = get_redis()
+        self.redis.delete(buffer.PENDING_KEY)
+        self.payload = {"video_id": self.video.id, "duration": 5, "event_id": uuid.uuid4().hex}
+
+    def _buffered(self):
+        return int(self.redis.hget(buffer.PENDING_KEY, self.video.id) or 0)
+
+    def test_failed_insert_buffers_nothing(self):
+        with mock.patch.object(WatchEvent.objects, 'create', side_effect=DatabaseError("write failed")):
+            response = self.client.post('/analytics/track/view/', self.payload, format='json')
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(self._buffered(), 0)
+
+        self.client.post('/analytics/track/view/', self.payload, format='json')
+        self.assertEqual((self._buffered(), WatchEvent.objects.count()), (1, 1))
+
+    def test_failed_buffer_stores_no_event(self):
+        with mock.patch('analytic.views.buffer_view', side_effect=redis.ConnectionError("Redis down")):
+            response = self.client.post('/analytics/track/view/', self.payload, format='json')
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(WatchEvent.objects.count(), 0)
+
+        self.client.post('/analytics/track/view/', self.payload, format='json')
+        self.assertEqual((self._buffered(), WatchEvent.objects.count()), (1, 1))
+
+    async def test_async_failed_buffer_stores_no_event(self):
+        headers = {"Authorization": f"Bearer {RefreshToken.for_user(self.user).access_token}"}
+        with mock.patch('analytic.async_views.buffer_view', side_effect=redis.ConnectionError("Redis down")):
+            response = await self.async_client.post('/analytics/async/track/view/', self.payload, content_type='application/json', headers=headers)
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(await WatchEvent.objects.acount(), 0)
+
+        await self.async_client.post('/analytics/async/track/view/', self.payload, content_type='application/json', headers=headers)
+        self.assertEqual((self._buffered(), await WatchEvent.objects.acount()), (1, 1))
+
+
+def _cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+class UserVideoAnalyticsTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='creator@example.com', password='pw', username='creator')
+        self.videos = [
+            VideoMetadata.objects.create(user=self.user, title=f'v{i}', video_file='v.mp4', thumbnail_file='t.png') for i in range(5)
+        ]
+        VideoAnalytics.objects.bulk_create([VideoAnalytics(video=video, views=i % 2) for i, video in enumerate(self.videos)])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_pages_cover_every_video_once(self):
+        for sort in ['recent', 'views', 'likes']:
+            seen, cursor = [], None
+            while True:
+                response = self.client.get('/analytics/get/analytics/user/', {'sort': sort, 'page_size': 2, **({'cursor': cursor} if cursor else {})})
+                self.assertEqual(response.status_code, 200)
+                seen += [int(video['video_id']) for video in response.data['results']]
+                cursor = response.data['next_cursor']
+                if not cursor:
+                    break
+            self.assertEqual(sorted(seen), sorted(video.id for video in self.videos), sort)
+
+    def test_malformed_cursor_is_rejected(self):
+        malformed = {
+            'recent': ['!!', _cursor([1]), _cursor('x'), _cursor(['garbage', 1]), _cursor(['2025-01-01T00:00:00Z', 'x']), _cursor([1, 1])],
+            'views': ['!!', _cursor([1]), _cursor(['x', 1]), _cursor([1, 'x']), _cursor([True, 1]), _cursor([1.5, 1])],
+        }
+        for sort, cursors in malformed.items():
+            for cursor in cursors:
+                response = self.client.get('/analytics/get/analytics/user/', {'sort': sort, 'cursor': cursor})
+                self.assertEqual(response.status_code, 400, (sort, cursor))
+                self.assertEqual(response.data, {"error": "Invalid cursor."})
+
+
+class DateRangeTests(TestCase):
+    def setUp(self):
+        user = CustomUser.objects.create_user(email='creator@example.com', password='pw', username='creator')
+        self.video = VideoMetadata.objects.create(user=user, title='t', video_file='v.mp4', thumbnail_file='t.png')
+
+    def _get(self, params):
+        return self.client.get(f'/analytics/get/analytics/{self.video.id}/', {'granularity': 'day', **params})
+
+    def test_unparseable_dates_are_rejected(self):
+        for params in [{'from': 'yesterday'}, {'to': 'garbage'}, {'from': '2025-02-30'}, {'from': '2025-01-01', 'to': '2025-13-01'}]:
+            response = self._get(params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertEqual(response.data, {"error": "'from' and 'to' must be dates (YYYY-MM-DD)."})
+
+    def test_missing_dates_default_to_the_last_30_days(self):
+        response = self._get({})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['series']), 30)
+        self.assertEqual(len(self._get({'from': '2025-01-01', 'to': '2025-01-07'}).data['series']), 7)
+
+
+class VideoSummaryCacheTests(TestCase):
+    """Redis failing anywhere in the summary cache falls back to computing the summary."""
+
+    def setUp(self):
+        user = CustomUser.objects.create_user(email='creator@example.com', password='pw', username='creator')
+        self.video = VideoMetadata.objects.create(user=user, title='t', video_file='v.mp4', thumbnail_file='t.png')
+        self.expected = cache.compute_video_summary(self.video.id)
+        cache.cache.clear()
+
+    def test_failing_set_and_lock_release_still_return_the_summary(self):
+        for method in ['set', 'delete']:
+            with mock.patch.object(cache.cache, method, side_effect=redis.ConnectionError("Redis down")):
+                self.assertEqual(cache.get_video_summary(self.video.id), self.expected, method)
+            cache.cache.clear()
+
+    def test_failing_read_while_waiting_for_the_lock_holder_computes(self):
+        gets = [None, redis.ConnectionError("Redis down")]
+        with mock.patch.object(cache.cache, 'add', return_value=False), \
+                mock.patch.object(cache.cache, 'get', side_effect=gets):
+            self.assertEqual(cache.get_video_summary(self.video.id), self.expected)
+
+
+@override_settings(ANALYTICS_ROLLUP_LAG=0)
+class RetentionCurveTests(TestCase):
+    def setUp(self):
+        self.users = [
+            CustomUser.objects.create_user(email=f'{name}@example.com', password='pw', username=name) for name in ['a', 'c', 'd']
+        ]
+        self.video = VideoMetadata.objects.create(user=self.users[0], title='t', video_file='v.mp4', thumbnail_file='t.png')
+        self.short = VideoMetadata.objects.create(user=self.users[0], title='s', video_file='v.mp4', thumbnail_file='t.png')
+        self.start = timezone.now() - timedelta(hours=1)
+        self.seconds = 0
+
+    def _events(self, video, user, *events, session=None):
+        rows = []
+        for event_type, details in events:
+            self.seconds += 1
+            at = self.start + timedelta(seconds=self.seconds)
+            details = {**details, **({'session': session} if session else {})}
+            rows.append(EngagementEvent(video=video, user=user, event_type=event_type, timestamp=at, details=details, created_at=at))
+        EngagementEvent.objects.bulk_create(rows)
+
+    def _curve(self, video):
+        return list(np.frombuffer(bytes(VideoRetention.objects.get(video=video).curve), dtype='<u2'))
+
+    def test_curves_from_pause_resume_and_seek(self):
+        a, c, d = self.users
+        # Watches [0, 40) before the first pause, then [40, 60)
+        self._events(self.video, a, ('pause', {'position': 40}), ('resume', {'position': 40}), ('pause', {'position': 60}))
+        # Anonymous, told apart by its session: [0, 10), seeks to 50, then [50, 70); reports the length
+        self._events(self.video, None, ('seek', {'from': 10, 'to': 50, 'video_length': 100}), ('pause', {'position': 70}), session='s1')
+        # [0, 30), [30, 50), then seeks back and rewatches [20, 40)
+        self._events(self.video, c, ('pause', {'position': 30}), ('resume', {'position': 30}),
+                     ('seek', {'from': 50, 'to': 20}), ('pause', {'position': 40}))
+        # No length reported: the furthest position watched (8s) is the whole video
+        self._events(self.short, a, ('pause', {'position': 8}))
+        self._events(self.short, d, ('pause', {'position': 4}))
+
+        self.assertEqual(retention.update_retention(), 2)
+
+        expected = [10000] * 10 + [6667] * 10 + [10000] * 20 + [6667] * 20 + [3333] * 10 + [0] * 30
+        self.assertEqual(self._curve(self.video), expected)
+        self.assertEqual(self._curve(self.short), [10000] * 50 + [5000] * 50)
+        stored = VideoRetention.objects.get(video=self.video)
+        self.assertEqual((stored.viewers, stored.length), (3, 100))
+        self.assertEqual(VideoRetention.objects.get(video=self.short).length, 8)
+
+    def test_second_run_recomputes_only_videos_with_new_events(self):
+        a, c, _ = self.users
+        self._events(self.video, a, ('pause', {'position': 40}))
+        self._events(self.short, a, ('pause', {'position': 8}))
+        self.assertEqual(retention.update_retention(), 2)
+        computed_at = VideoRetention.objects.get(video=self.video).computed_at
+
+        self._events(self.short, c, ('pause', {'position': 4}))
+        with mock.patch('analytic.retention.compute_curves', wraps=retention.compute_curves) as compute:
+            self.assertEqual(retention.update_retention(), 1)
+            compute.assert_called_once_with([self.short.id])
+            self.assertEqual(retention.update_retention(), 0)
+        self.assertEqual(VideoRetention.objects.get(video=self.video).computed_at, computed_at)
+        self.assertEqual(VideoRetention.objects.get(video=self.short).viewers, 2)
+
+
+@override_settings(ANALYTICS_ENGAGEMENT_RETENTION_DAYS={'hover': 7, 'seek': 30, 'pause': 60, 'resume': 60})
+class EngagementRetentionTests(TestCase):
+    """Without partitions (SQLite) expired months and short-lived types are deleted in chunks."""
+
+    def setUp(self):
+        user = CustomUser.objects.create_user(email='viewer@example.com', password='pw', username='viewer')
+        self.video = VideoMetadata.objects.create(user=user, title='t', video_file='v.mp4', thumbnail_file='t.png')
+        self.now = datetime(2026, 6, 15, 12, tzinfo=dt_timezone.utc)
+
+    def _event(self, event_type, created_at):
+        return EngagementEvent(video=self.video, event_type=event_type, timestamp=created_at, created_at=created_at)
+
+    def _remaining(self):
+        return sorted(EngagementEvent.objects.values_list('event_type', 'created_at'))
+
+    def test_expired_months_are_counted_and_deleted(self):
+        expired = [datetime(2026, 1, 10), datetime(2026, 2, 10), datetime(2026, 2, 20), datetime(2026, 3, 31, 23)]
+        kept = [datetime(2026, 4, 5)]  # past the retention, but its month is not over yet
+        EngagementEvent.objects.bulk_create(
+            [self._event('pause', at.replace(tzinfo=dt_timezone.utc)) for at in expired + kept]
+        )
+
+        with mock.patch.object(partitions, 'DELETE_CHUNK', 3):
+            self.assertEqual(partitions.retire_expired_months(self.now), 3)
+        self.assertEqual(self._remaining(), [('pause', kept[0].replace(tzinfo=dt_timezone.utc))])
+        self.assertEqual(partitions.retire_expired_months(self.now), 0)
+
+    def test_short_lived_types_are_pruned(self):
+        events = [
+            ('hover', self.now - timedelta(days=8)),
+            ('hover', self.now - timedelta(days=9)),
+            ('hover', self.now - timedelta(days=6)),
+            ('seek', self.now - timedelta(days=31)),
+            ('seek', self.now - timedelta(days=29)),
+            ('pause', self.now - timedelta(days=59)),
+        ]
+        EngagementEvent.objects.bulk_create([self._event(event_type, at) for event_type, at in events])
+
+        with mock.patch.object(partitions, 'DELETE_CHUNK', 1):
+            self.assertEqual(partitions.prune_event_types(self.now), 3)
+        self.assertEqual(self._remaining(), sorted([events[2], events[4], events[5]]))
+
+
+class AnalyticsExportTests(TestCase):
+    def setUp(self):
+        admin = CustomUser.objects.create_user(email='admin@example.com', password='pw', username='admin', is_staff=True)
+        fans = [CustomUser.objects.create_user(email=f'f{i}@example.com', password='pw', username=f'f{i}') for i in range(3)]
+        video = VideoMetadata.objects.create(user=admin, title='t', video_file='v.mp4', thumbnail_file='t.png')
+        hour = timezone.now().replace(minute=0, second=0, microsecond=0)
+        VideoAnalyticsHourly.objects.bulk_create([
+            VideoAnalyticsHourly(video=video, bucket=hour - timedelta(hours=i), views=i, watch_seconds=10 * i) for i in range(5)
+        ])
+        WatchEvent.objects.bulk_create([WatchEvent(video=video, user=fans[i % 3], duration=i) for i in range(5)])
+        EngagementEvent.objects.bulk_create([
+            EngagementEvent(video=video, event_type='seek', timestamp=hour, details={"from": i, "to": i + 1}) for i in range(5)
+        ])
+        Like.objects.bulk_create([Like(video=video, user=fan, like_status='like') for fan in fans])
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def _export(self, dataset, output, after_id=0):
+        response = self.client.get('/analytics/get/analytics/admin/export/', {'dataset': dataset, 'output': output, 'after_id': after_id})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        body = b''.join(response.streaming_content).decode()
+        if output == 'csv':
+            rows = list(csv.DictReader(io.StringIO(body)))
+            return [int(row['id']) for row in rows], rows
+        rows = [json.loads(line) for line in body.splitlines()]
+        return [row['id'] for row in rows], rows
+
+    def test_every_dataset_streams_and_resumes_without_gaps_or_repeats(self):
+        for dataset, (model, fields, _) in exports.DATASETS.items():
+            expected = list(model.objects.order_by('pk').values_list('pk', flat=True))
+            for output in exports.FORMATS:
+                with self.subTest(dataset=dataset, output=output), mock.patch.object(exports, 'ROWS_PER_CHUNK', 2):
+                    ids, rows = self._export(dataset, output)
+                    self.assertEqual(ids, expected)
+                    self.assertEqual(list(rows[0]), fields)
+
+                    # The client lost the stream after two rows and resumes from the last id it has
+                    resumed, _ = self._export(dataset, output, after_id=ids[1])
+                    self.assertEqual(ids[:2] + resumed, expected)
+
+    def test_json_details_are_encoded(self):
+        _, rows = self._export('engagements', 'csv')
+        self.assertEqual(json.loads(rows[0]['details']), {"from": 0, "to": 1})
+        _, rows = self._export('engagements', 'ndjson')
+        self.assertEqual(rows[0]['details'], {"from": 0, "to": 1})
+
+
+class LegacyBackfillTests(TestCase):
+    def setUp(self):
+        user = CustomUser.objects.create_user(email='viewer@example.com', password='pw', username='viewer')
+        for i in range(3):
+            video = VideoMetadata.objects.create(user=user, title=f'v{i}', video_file='v.mp4', thumbnail_file='t.png')
+            VideoAnalytics.objects.create(
+                video=video,
+                watch_time=[{"user_id": user.id, "duration": 10 + j, "timestamp": "2025-01-01T00:00:00Z"} for j in range(2)],
+                engagements=[{"event_type": "pause", "timestamp": "2025-01-01T00:00:05Z", "details": {"position": 5}}],
+            )
+
+    def _backfill(self):
+        call_command('backfill_analytics_events', chunk_size=1, stdout=io.StringIO())
+
+    def _legacy_rows(self):
+        return VideoAnalytics.objects.exclude(watch_time=[], engagements=[]).count()
+
+    def test_second_run_creates_no_duplicates(self):
+        self._backfill()
+        self.assertEqual((WatchEvent.objects.count(), EngagementEvent.objects.count(), self._legacy_rows()), (6, 3, 0))
+        self._backfill()
+        self.assertEqual((WatchEvent.objects.count(), EngagementEvent.objects.count()), (6, 3))
+
+    def test_interrupted_run_keeps_unwritten_json_and_resumes(self):
+        bulk_create = EngagementEvent.objects.bulk_create
+        calls = []
+
+        def fail_second_chunk(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 2:
+                raise DatabaseError("connection lost")
+            return bulk_create(*args, **kwargs)
+
+        with mock.patch.object(EngagementEvent.objects, 'bulk_create', side_effect=fail_second_chunk):
+            with self.assertRaises(DatabaseError):
+                self._backfill()
+        # Only the first chunk was written, and only its JSON was cleared
+        self.assertEqual((WatchEvent.objects.count(), EngagementEvent.objects.count(), self._legacy_rows()), (2, 1, 2))
+
+        self._backfill()
+        self.assertEqual((WatchEvent.objects.count(), EngagementEvent.objects.count(), self._legacy_rows()), (6, 3, 0))
+        self.assertEqual(
+            sorted(WatchEvent.objects.values_list('video_id', 'duration')),
+            sorted((row.video_id, 10 + j) for row in VideoAnalytics.objects.all() for j in range(2)),
+        )
@@ -0,0 +1,31 @@
+from django.db.models import Sum
+
+from .models import PlatformAnalyticsTotals, VideoAnalytics
+from .rollups import total_watch_seconds
+
+TOTALS_PK = 1
+
+
+def reconcile_totals():
+    """Recompute the platform totals from the per-video counters and rollups and store them."""
+    # Likes and dislikes come from the per-video counters (see analytic.reactions)
+    counters = VideoAnalytics.objects.aggregate(views=Sum('views'), likes=Sum('likes'), dislikes=Sum('dislikes'))
+    totals, _ = PlatformAnalyticsTotals.objects.update_or_create(
+        pk=TOTALS_PK,
+        defaults={
+            'total_views': counters['views'] or 0,
+            'total_watch_time': total_watch_seconds(),
+            'total_likes': counters['likes'] or 0,
+            'total_dislikes': counters['dislikes'] or 0,
+        },
+    )
+    return totals
+
+
+def get_totals(exact=False):
+    """Stored totals, recomputed first when exact is set or when they have never been computed."""
+    if not exact:
+        totals = PlatformAnalyticsTotals.objects.filter(pk=TOTALS_PK).first()
+        if totals is not None:
+            return totals
+    return reconcile_totals()
@@ -0,0 +1,148 @@
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import redis
+from django.conf import settings
+from django.db.models import F
+
+from videos.models import VideoMetadata
+
+from .models import VideoAnalyticsHourly
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Scores are stored as weight * 2^((t - epoch) / half_life), so older events never need rewriting:
+# ranking by the stored value is the same as ranking by the decayed value. The epoch is moved
+# forward by rebuild_scores to keep the stored numbers small.
+_RECORD_SCRIPT = """
+local now = tonumber(ARGV[1])
+local n = #KEYS / 2
+for i = 1, n do
+    local zkey, ekey = KEYS[2 * i - 1], KEYS[2 * i]
+    local half_life = tonumber(ARGV[1 + i])
+    local epoch = tonumber(redis.call('GET', ekey))
+    if not epoch then
+        epoch = now
+        redis.call('SET', ekey, now)
+    end
+    local scale = 2 ^ ((now - epoch) / half_life)
+    for j = n + 2, #ARGV, 2 do
+        redis.call('ZINCRBY', zkey, tonumber(ARGV[j + 1]) * scale, ARGV[j])
+    end
+end
+"""
+
+
+def _key(half_life):
+    return f'analytics:trending:{half_life}h'
+
+
+def _epoch_key(half_life):
+    return f'{_key(half_life)}:epoch'
+
+
+def _record_call(counts, kind):
+    weight = settings.ANALYTICS_TRENDING_WEIGHTS.get(kind, 0)
+    if not counts or not weight:
+        return None
+
+    half_lives = settings.ANALYTICS_TRENDING_HALF_LIVES
+    keys = [key for half_life in half_lives for key in (_key(half_life), _epoch_key(half_life))]
+    args = [time.time()] + [half_life * 3600 for half_life in half_lives]
+    for video_id, n in counts.items():
+        args += [video_id, weight * n]
+    return keys, args
+
+
+def record(counts, kind):
+    """Add trending weight for {video_id: number of events} of the given kind (view, like or engagement)."""
+    call = _record_call(counts, kind)
+    if call is None:
+        return
+
+    keys, args = call
+    try:
+        client = get_redis()
+        client.register_script(_RECORD_SCRIPT)(keys=keys, args=args)
+    except redis.RedisError:
+        # Trending is best effort; a Redis outage must not fail ingestion
+        logger.warning("Could not record %s events for trending", kind, exc_info=True)
+
+
+def queue_record(pipe, counts, kind):
+    """Like record(), but added to a (sync or asyncio) pipeline; EVAL avoids NOSCRIPT inside pipelines."""
+    call = _record_call(counts, kind)
+    if call is not None:
+        keys, args = call
+        pipe.eval(_RECORD_SCRIPT, len(keys), *keys, *args)
+
+
+def top_videos(k, half_life):
+    """Top k public videos by decayed score, as (video, score) pairs."""
+    client = get_redis()
+    epoch = float(client.get(_epoch_key(half_life)) or time.time())
+    decay = 2 ** ((time.time() - epoch) / (half_life * 3600))
+
+    results = []
+    start = 0
+    page = k * 2
+    while len(results) < k:
+        # Over-fetch and drop videos that are not public, until k are found or the set runs out
+        entries = client.zrevrange(_key(half_life), start, start + page - 1, withscores=True)
+        if not entries:
+            break
+        videos = VideoMetadata.objects.filter(id__in=[int(video_id) for video_id, _ in entries], visibility='public').only('id', 'title')
+        videos = {video.id: video for video in videos}
+        for video_id, score in entries:
+            video = videos.get(int(video_id))
+            if video is not None:
+                results.append((video, score / decay))
+        start += page
+
+    return results[:k]
+
+
+def rebuild_scores():
+    """Recompute every trending set from the hourly rollups. Returns the number of videos scored."""
+    client = get_redis()
+    half_lives = settings.ANALYTICS_TRENDING_HALF_LIVES
+    weights = settings.ANALYTICS_TRENDING_WEIGHTS
+    now = time.time()
+    window = max(half_lives) * 3600 * settings.ANALYTICS_TRENDING_WINDOW_HALF_LIVES
+    scores = {half_life: defaultdict(float) for half_life in half_lives}
+
+    rows = (
+        VideoAnalyticsHourly.objects
+        .filter(bucket__gte=datetime.fromtimestamp(now - window, tz=timezone.utc), video__visibility='public')
+        .annotate(events=F('pause_events') + F('resume_events') + F('seek_events') + F('hover_events'))
+        .values_list('video_id', 'bucket', 'views', 'likes', 'events')
+        .iterator(chunk_size=2000)
+    )
+    for video_id, bucket, views, likes, events in rows:
+        weight = views * weights.get('view', 0) + likes * weights.get('like', 0) + events * weights.get('engagement', 0)
+        age = max(now - (bucket.timestamp() + 1800), 0)  # from the middle of the hour
+        for half_life in half_lives:
+            if age <= half_life * 3600 * settings.ANALYTICS_TRENDING_WINDOW_HALF_LIVES:
+                scores[half_life][video_id] += weight * 2 ** (-age / (half_life * 3600))
+
+    for half_life, video_scores in scores.items():
+        staging = f'{_key(half_life)}:rebuild'
+        client.delete(staging)
+        items = list(video_scores.items())
+        for i in range(0, len(items), 1000):
+            client.zadd(staging, dict(items[i:i + 1000]))
+
+        # Swap the new set in and reset its epoch in one transaction
+        pipe = client.pipeline(transaction=True)
+        if items:
+            pipe.rename(staging, _key(half_life))
+        else:
+            pipe.delete(_key(half_life))
+        pipe.set(_epoch_key(half_life), now)
+        pipe.execute()
+
+    return len(set().union(*scores.values()))
+
@@ -1,14 +1,26 @@
 from django.urls import path
-from .views import AdminAnalyticsOverviewAPIView, EngagementTrackAPIView, TrackViewAPIView, UserVideoAnalyticsAPIView, VideoAnalyticsSummaryAPIView
+
+from . import async_views
+from .views import AdminAnalyticsOverviewAPIView, AdminDedupeStatsAPIView, AnalyticsExportAPIView, EngagementBatchTrackAPIView, EngagementTrackAPIView, TrackViewAPIView, TrendingVideosAPIView, UserVideoAnalyticsAPIView, VideoAnalyticsSummaryAPIView, VideoRetentionAPIView
 
 urlpatterns = [
     path('track/view/', TrackViewAPIView.as_view(), name='track-view'),
     path('track/engagement/', EngagementTrackAPIView.as_view(), name='track-engagement'),
+    path('track/engagement/batch/', EngagementBatchTrackAPIView.as_view(), name='track-engagement-batch'),
+
+    # Async ingestion, for ASGI deployments (sql_apis.asgi)
+    path('async/track/view/', async_views.track_view, name='async-track-view'),
+    path('async/track/engagement/', async_views.track_engagement, name='async-track-engagement'),
 
     path('get/analytics/<int:video_id>/', VideoAnalyticsSummaryAPIView.as_view(), name='video-analytics-summary'),
+    path('get/analytics/<int:video_id>/retention/', VideoRetentionAPIView.as_view(), name='video-retention'),
 
     path('get/analytics/user/', UserVideoAnalyticsAPIView.as_view()),
 
     path('get/analytics/admin/overview/', AdminAnalyticsOverviewAPIView.as_view(), name='admin-analytics-overview'),
+    path('get/analytics/admin/export/', AnalyticsExportAPIView.as_view(), name='admin-analytics-export'),
+    path('get/analytics/admin/dedupe/', AdminDedupeStatsAPIView.as_view(), name='admin-analytics-dedupe'),
+
+    path('trending/', TrendingVideosAPIView.as_view(), name='trending-videos'),
     
 ]
\ No newline at end of file
@@ -1,19 +1,32 @@
+from collections import Counter
+
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
 
 # Create your views here.
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAdminUser, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticatedOrReadOnly, IsAdminUser, IsAuthenticated
 from rest_framework import status
-from django.db.models import Sum, Count
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils.dateparse import parse_datetime
 
 from django.utils import timezone
 
-from engagement.models import Like
 
 
-from .models import VideoMetadata, VideoAnalytics
-from .serializers import AdminAnalyticsOverviewSerializer, EngagementSerializer, TrackViewSerializer, VideoAnalyticsSummarySerializer
+from . import dedupe, sketches, trending
+from .buffer import buffer_view
+from .cache import get_video_summary, invalidate_video_summaries
+from .exports import DATASETS, FORMATS, export_rows, stream_export
+from .models import EngagementEvent, VideoMetadata, VideoAnalytics, VideoRetention, WatchEvent
+from .pagination import after, decode_datetime_cursor, decode_int_cursor, encode_cursor, get_page_size
+from .queries import with_creator_analytics
+from .series import get_date_range, get_series
+from .totals import get_totals
+from .serializers import AdminAnalyticsOverviewSerializer, DedupeStatsSerializer, EngagementSerializer, SeriesPointSerializer, TrackViewSerializer, TrendingVideoSerializer, UserVideoAnalyticsSerializer, VideoRetentionSerializer, VideoSummarySerializer
 
 class TrackViewAPIView(APIView):
     permission_classes = [IsAuthenticatedOrReadOnly]
@@ -25,22 +38,39 @@ class TrackViewAPIView(APIView):
                 video_id = serializer.validated_data['video_id']
                 duration = serializer.validated_data['duration']
                 user = request.user if request.user.is_authenticated else None
+                viewer = sketches.viewer_id(request)
+
+                # A retried or double-fired beacon is acknowledged without touching the database
+                event_id = serializer.validated_data.get('event_id')
+                if event_id and dedupe.seen('view', viewer, [event_id])[0]:
+                    return Response({"message": "View already recorded.", "duplicate": True}, status=status.HTTP_200_OK)
 
                 try:
                     video = VideoMetadata.objects.get(id=video_id)
                 except VideoMetadata.DoesNotExist:
                     return Response({"error": "Video not found"}, status=status.HTTP_404_NOT_FOUND)
 
-                analytics, created = VideoAnalytics.objects.get_or_create(video=video)
-                analytics.views += 1
-
-                analytics.watch_time.append({
-                    "user_id": user.id if user else None,
-                    "duration": duration,
-                    "timestamp": str(timezone.now())
-                })
-
-                analytics.save()
+                if settings.ANALYTICS_VIEW_BUFFER_ENABLED:
+                    # Counted in Redis and flushed to VideoAnalytics.views by the flush_view_buffer task.
+                    # Buffered last: a failed insert counts nothing, and a failed buffer rolls the insert back
+                    with transaction.atomic():
+                        WatchEvent.objects.create(video=video, user=user, duration=duration)
+                        buffer_view(video.id)
+                else:
+                    # One insert per view; the counter is bumped in SQL so concurrent views don't overwrite each other
+                    with transaction.atomic():
+                        analytics, created = VideoAnalytics.objects.get_or_create(video=video)
+                        VideoAnalytics.objects.filter(pk=analytics.pk).update(views=F('views') + 1)
+                        WatchEvent.objects.create(video=video, user=user, duration=duration)
+                    invalidate_video_summaries([video.id])
+
+                # Only a stored view is counted elsewhere and makes its id a duplicate, so a failed
+                # attempt can be retried without counting it twice
+                trending.record({video.id: 1}, 'view')
+                sketches.record_viewer(video.id, viewer)
+                sketches.record_watch_time(video.id, video.user_id, duration)
+                if event_id:
+                    dedupe.add('view', viewer, [event_id])
 
                 return Response({"message": "View recorded successfully."}, status=status.HTTP_200_OK)
 
@@ -62,22 +92,26 @@ class EngagementTrackAPIView(APIView):
                 timestamp = serializer.validated_data['timestamp']
                 details = serializer.validated_data.get('details', {})
 
+                viewer = sketches.viewer_id(request)
+                event_id = serializer.validated_data.get('event_id')
+                if event_id and dedupe.seen('engagement', viewer, [event_id])[0]:
+                    return Response({"message": "Engagement already tracked.", "duplicate": True}, status=status.HTTP_200_OK)
+
                 try:
                     video = VideoMetadata.objects.get(id=video_id)
                 except VideoMetadata.DoesNotExist:
                     return Response({"error": "Video not found"}, status=status.HTTP_404_NOT_FOUND)
 
-                analytics, _ = VideoAnalytics.objects.get_or_create(video=video)
-
-                engagement_entry = {
-                    "event_type": event_type,
-                    "timestamp": str(timestamp),
-                    "details": details,
-                    "user_id": request.user.id if request.user.is_authenticated else None
-                }
-
-                analytics.engagements.append(engagement_entry)
-                analytics.save()
+                EngagementEvent.objects.create(
+                    video=video,
+                    user=request.user if request.user.is_authenticated else None,
+                    event_type=event_type,
+                    timestamp=timestamp,
+                    details=details,
+                )
+                if event_id:
+                    dedupe.add('engagement', viewer, [event_id])
+                trending.record({video.id: 1}, 'engagement')
 
                 return Response({"message": "Engagement tracked successfully."}, status=status.HTTP_200_OK)
 
@@ -85,65 +119,209 @@ class EngagementTrackAPIView(APIView):
 
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        
 
 
-class VideoAnalyticsSummaryAPIView(APIView):
-    def get(self, request, video_id):
+class EngagementBatchTrackAPIView(APIView):
+    """Track many engagement events, across any number of videos, in one request."""
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def post(self, request):
         try:
-            video = VideoMetadata.objects.get(id=video_id)
-        except VideoMetadata.DoesNotExist:
-            return Response({"error": "Video not found"}, status=status.HTTP_404_NOT_FOUND)
+            events = request.data.get('events') if isinstance(request.data, dict) else request.data
+            if not isinstance(events, list) or not events:
+                return Response({"error": "Expected a non-empty list of events."}, status=status.HTTP_400_BAD_REQUEST)
+            if len(events) > settings.ANALYTICS_ENGAGEMENT_BATCH_MAX_SIZE:
+                return Response(
+                    {"error": f"A batch can hold at most {settings.ANALYTICS_ENGAGEMENT_BATCH_MAX_SIZE} events."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            serializer = EngagementSerializer(data=events, many=True)
+            errors = []
+            if serializer.is_valid():
+                valid = list(enumerate(serializer.validated_data))
+            else:
+                # Keep the valid events and report the rest by their position in the batch
+                valid = []
+                for index, (event, error) in enumerate(zip(events, serializer.errors)):
+                    if error:
+                        errors.append({"index": index, "errors": error})
+                    else:
+                        valid.append((index, serializer.child.run_validation(event)))
+
+            # Drop events whose client event_id was already tracked, and repeats within this batch
+            viewer = sketches.viewer_id(request)
+            with_ids = [(index, data) for index, data in valid if data.get('event_id')]
+            repeated = dedupe.seen('engagement', viewer, [data['event_id'] for _, data in with_ids])
+            duplicate_indexes, batch_ids = set(), set()
+            for (index, data), duplicate in zip(with_ids, repeated):
+                if duplicate or data['event_id'] in batch_ids:
+                    duplicate_indexes.add(index)
+                batch_ids.add(data['event_id'])
+            valid = [(index, data) for index, data in valid if index not in duplicate_indexes]
+
+            # Resolve every referenced video in a single query
+            video_ids = {data['video_id'] for _, data in valid}
+            known_videos = set(VideoMetadata.objects.filter(id__in=video_ids).values_list('id', flat=True))
+
+            user = request.user if request.user.is_authenticated else None
+            rows = []
+            for index, data in valid:
+                if data['video_id'] not in known_videos:
+                    errors.append({"index": index, "errors": {"video_id": ["Video not found"]}})
+                    continue
+                rows.append(EngagementEvent(
+                    video_id=data['video_id'],
+                    user=user,
+                    event_type=data['event_type'],
+                    timestamp=data['timestamp'],
+                    details=data.get('details', {}),
+                ))
+
+            EngagementEvent.objects.bulk_create(rows, batch_size=500)
+            dedupe.add('engagement', viewer, [
+                data['event_id'] for index, data in valid
+                if data.get('event_id') and data['video_id'] in known_videos
+            ])
+            trending.record(Counter(row.video_id for row in rows), 'engagement')
+
+            errors.sort(key=lambda error: error['index'])
+            response_status = status.HTTP_200_OK if rows or duplicate_indexes else status.HTTP_400_BAD_REQUEST
+            return Response(
+                {"accepted": len(rows), "duplicates": len(duplicate_indexes), "rejected": len(errors), "errors": errors},
+                status=response_status
+            )
 
-        analytics, _ = VideoAnalytics.objects.get_or_create(video=video)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        # Calculate average watch time
-        watch_times = [entry.get('duration', 0) for entry in analytics.watch_time]
-        avg_watch_time = sum(watch_times) / len(watch_times) if watch_times else 0
 
-        # Calculate likes and dislikes from Likes table
-        likes_count = Like.objects.filter(video_id=video_id, like_status='like').count()
-        dislikes_count = Like.objects.filter(video_id=video_id, like_status='dislike').count()
+
+class VideoAnalyticsSummaryAPIView(APIView):
+    def get(self, request, video_id):
+        # Approximate unique viewers, and with ?granularity= a series, over ?from=..&to=..
+        # (dates, default: the last 30 days)
+        try:
+            start, end = get_date_range(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if (end - start).days >= settings.ANALYTICS_UNIQUE_VIEWERS_RETENTION_DAYS:
+            return Response({"error": "Invalid 'from'/'to' range."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Views, likes and watch time come from the read-through cache; the range-dependent
+        # unique viewer count is a cheap PFCOUNT and is always read live
+        summary = get_video_summary(video_id)
+        if summary is None:
+            return Response({"error": "Video not found"}, status=status.HTTP_404_NOT_FOUND)
 
         response_data = {
-            "video_id": video.id,
-            "views": analytics.views,
-            "likes": likes_count,
-            "dislikes": dislikes_count,
-            "average_watch_time": avg_watch_time
+            **summary,
+            "unique_viewers": sketches.unique_viewers(video_id, start, end),
+            "unique_viewers_from": start,
+            "unique_viewers_to": end,
         }
+        granularity = request.query_params.get('granularity')
+        if granularity:
+            try:
+                response_data["series"] = get_series(start, end, granularity, video_id=video_id)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            response_data["granularity"] = granularity
 
         # use serializer
-        serializer=VideoAnalyticsSummarySerializer(data=response_data)
+        serializer = VideoSummarySerializer(data=response_data)
         if serializer.is_valid():
             return Response(serializer.data, status=status.HTTP_200_OK)
         else:
             return Response(serializer.errors, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
+class VideoRetentionAPIView(APIView):
+    """Share of viewers still watching at each percent of the video, from the retention job."""
+
+    def get(self, request, video_id):
+        try:
+            retention = VideoRetention.objects.get(video_id=video_id)
+        except VideoRetention.DoesNotExist:
+            return Response({"error": "No retention data for this video yet."}, status=status.HTTP_404_NOT_FOUND)
+
+        serializer = VideoRetentionSerializer(retention)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
 class UserVideoAnalyticsAPIView(APIView):
+    """Analytics for the logged-in creator's videos, one keyset-paginated query per page.
+
+    Query params: sort (recent, views or likes), since (videos created on or after),
+    page_size and cursor (the next_cursor of the previous page). With granularity (hour, day
+    or week) the response also has a series summed over all the creator's videos between
+    from and to (dates, default: the last 30 days).
+    """
     permission_classes = [IsAuthenticated]
 
+    SORT_FIELDS = {'recent': 'created_at', 'views': 'view_count', 'likes': 'like_count'}
+
     def get(self, request):
         try:
-            user = request.user
-            # Get all videos created by this user
-            videos = VideoMetadata.objects.filter(user=user)
-            if not videos.exists():
+            sort = request.query_params.get('sort', 'recent')
+            if sort not in self.SORT_FIELDS:
+                return Response({"error": f"'sort' must be one of {list(self.SORT_FIELDS)}."}, status=status.HTTP_400_BAD_REQUEST)
+            sort_field = self.SORT_FIELDS[sort]
+
+            try:
+                page_size = get_page_size(request)
+                cursor = request.query_params.get('cursor')
+                if cursor:
+                    decode = decode_datetime_cursor if sort_field == 'created_at' else decode_int_cursor
+                    cursor = decode(cursor)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            videos = VideoMetadata.objects.filter(user=request.user)
+
+            series = None
+            granularity = request.query_params.get('granularity')
+            if granularity:
+                try:
+                    start, end = get_date_range(request)
+                    series = get_series(start, end, granularity, video__user=request.user)
+                except ValueError as e:
+                    return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            since = request.query_params.get('since')
+            if since:
+                since_value = parse_datetime(since)  # also accepts a plain date
+                if since_value is None:
+                    return Response({"error": "'since' must be an ISO date or datetime."}, status=status.HTTP_400_BAD_REQUEST)
+                if timezone.is_naive(since_value):
+                    since_value = timezone.make_aware(since_value)
+                videos = videos.filter(created_at__gte=since_value)
+
+            videos = with_creator_analytics(videos).order_by(f'-{sort_field}', '-pk')
+            if cursor:
+                videos = videos.filter(after(sort_field, *cursor))
+
+            page = list(videos[:page_size + 1])
+            if not page and not cursor and not since and not VideoMetadata.objects.filter(user=request.user).exists():
                 return Response({"message": "No videos found for this user."}, status=status.HTTP_404_NOT_FOUND)
 
-            analytics_data = []
-            for video in videos:
-                try:
-                    analytics = VideoAnalytics.objects.get(video=video)
-                    serializer = VideoAnalyticsSummarySerializer(analytics)
-                    data = serializer.data
-                    data['video_id'] = str(video.id)
-                    data['video_title'] = video.title
-                    analytics_data.append(data)
-                except VideoAnalytics.DoesNotExist:
-                    continue  # Skip if no analytics found
-
-            return Response(analytics_data, status=status.HTTP_200_OK)
+            next_cursor = None
+            if len(page) > page_size:
+                page = page[:page_size]
+                last = page[-1]
+                next_cursor = encode_cursor([getattr(last, sort_field), last.pk])
+
+            serializer = UserVideoAnalyticsSerializer(
+                page, many=True, context={'percentiles': sketches.video_watch_percentiles(video.pk for video in page)}
+            )
+            data = {
+                "results": serializer.data,
+                "next_cursor": next_cursor,
+                "creator_watch_time_percentiles": sketches.creator_watch_percentiles(request.user.id),
+            }
+            if series is not None:
+                data["granularity"] = granularity
+                data["series"] = SeriesPointSerializer(series, many=True).data
+            return Response(data, status=status.HTTP_200_OK)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
@@ -153,19 +331,14 @@ class AdminAnalyticsOverviewAPIView(APIView):
 
     def get(self, request):
         try:
-            total_views = VideoAnalytics.objects.aggregate(total=Sum('views'))['total'] or 0
-            total_watch_time = 0
-            all_analytics = VideoAnalytics.objects.all()
-            for analytics in all_analytics:
-                for entry in analytics.watch_time:
-                    total_watch_time += entry.get("duration", 0)
-
-            total_likes = Like.objects.filter(like_status='like').count()
-            total_dislikes = Like.objects.filter(like_status='dislike').count()
+            # Running totals kept by the reconcile_analytics_totals task; ?exact=true recomputes them now
+            exact = request.query_params.get('exact', '').lower() in ('1', 'true')
+            totals = get_totals(exact=exact)
 
             trending_videos = (
                 VideoAnalytics.objects
-                .annotate(total=Sum('views'))
+                .select_related('video')
+                .only('views', 'video__id', 'video__title')
                 .order_by('-views')[:5]
             )
 
@@ -178,10 +351,10 @@ class AdminAnalyticsOverviewAPIView(APIView):
                 })
 
             data = {
-                "total_views": total_views,
-                "total_likes": total_likes,
-                "total_dislikes": total_dislikes,
-                "total_watch_time": total_watch_time,
+                "total_views": totals.total_views,
+                "total_likes": totals.total_likes,
+                "total_dislikes": totals.total_dislikes,
+                "total_watch_time": totals.total_watch_time,
                 "trending_videos": trending_data
             }
 
@@ -189,4 +362,81 @@ class AdminAnalyticsOverviewAPIView(APIView):
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class AdminDedupeStatsAPIView(APIView):
+    """Memory use and estimated false-positive rate of the event id dedupe filter."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        try:
+            serializer = DedupeStatsSerializer(dedupe.stats())
+            return Response(serializer.data, status=status.HTTP_200_OK)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class TrendingVideosAPIView(APIView):
+    """Public videos ranked by a time-decayed score of views, likes and engagement."""
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        try:
+            k = int(request.query_params.get('k', 10))
+            half_life = int(request.query_params.get('half_life', settings.ANALYTICS_TRENDING_HALF_LIVES[0]))
+        except ValueError:
+            return Response({"error": "'k' and 'half_life' must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not 1 <= k <= settings.ANALYTICS_TRENDING_MAX_K:
+            return Response({"error": f"'k' must be between 1 and {settings.ANALYTICS_TRENDING_MAX_K}."}, status=status.HTTP_400_BAD_REQUEST)
+        if half_life not in settings.ANALYTICS_TRENDING_HALF_LIVES:
+            return Response(
+                {"error": f"'half_life' must be one of {settings.ANALYTICS_TRENDING_HALF_LIVES} (hours)."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            top = trending.top_videos(k, half_life)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        data = [{"video_id": video.id, "title": video.title, "score": score} for video, score in top]
+        serializer = TrendingVideoSerializer(data, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+
+class AnalyticsExportAPIView(APIView):
+    """Stream views, watch events, engagements or likes as CSV or NDJSON.
+
+    Query params: dataset, output (csv or ndjson), from/to (ISO datetimes) and after_id to
+    resume an interrupted export from the last id received.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        dataset = request.query_params.get('dataset')
+        output_format = request.query_params.get('output', 'csv')
+        if dataset not in DATASETS:
+            return Response({"error": f"'dataset' must be one of {list(DATASETS)}."}, status=status.HTTP_400_BAD_REQUEST)
+        if output_format not in FORMATS:
+            return Response({"error": f"'output' must be one of {list(FORMATS)}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        bounds = {}
+        for param in ('from', 'to'):
+            value = request.query_params.get(param)
+            if value:
+                parsed = parse_datetime(value)
+                if parsed is None:
+                    return Response({"error": f"'{param}' must be an ISO date or datetime."}, status=status.HTTP_400_BAD_REQUEST)
+                bounds[param] = timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+        try:
+            after_id = int(request.query_params.get('after_id', 0))
+        except ValueError:
+            return Response({"error": "'after_id' must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        fields, rows = export_rows(dataset, start=bounds.get('from'), end=bounds.get('to'), after_id=after_id)
+        response = StreamingHttpResponse(stream_export(fields, rows, output_format), content_type=FORMATS[output_format])
+        response['Content-Disposition'] = f'attachment; filename="{dataset}.{output_format}"'
+        return response
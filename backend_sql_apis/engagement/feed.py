@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+
+from analytic.pagination import after, decode_cursor
+from analytic.redis_client import get_redis
+from users.models import Profile
+from videos.models import VideoMetadata
+
+from .models import Subscription
+
+# Subscription feed. A new public video of a channel with at most FEED_FANOUT_MAX_SUBSCRIBERS
+# subscribers is pushed into each subscriber's inbox, a sorted set of video ids scored by upload
+# time (microseconds) and capped at FEED_INBOX_SIZE. Bigger channels are not fanned out; their
+# videos are read from the database when the feed is read and merged with the inbox.
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _inbox_key(user_id):
+    return f'feed:inbox:{user_id}'
+
+
+def _score(created_at):
+    return (created_at - _EPOCH) // timedelta(microseconds=1)
+
+
+def _created_at(score):
+    return _EPOCH + timedelta(microseconds=score)
+
+
+_MAX_SCORE = _score(datetime.max.replace(tzinfo=timezone.utc))
+
+
+def decode_feed_cursor(cursor):
+    """(score, video id) of a feed cursor; raises ValueError if malformed."""
+    values = decode_cursor(cursor)
+    if not (isinstance(values, list) and len(values) == 2 and all(type(value) is int for value in values)):
+        raise ValueError("Invalid cursor.")
+    if not 0 <= values[0] <= _MAX_SCORE:
+        raise ValueError("Invalid cursor.")
+    return tuple(values)
+
+
+def fan_out_video(video_id):
+    """Push a new video into its channel subscribers' inboxes. Returns the number of inboxes written."""
+    video = VideoMetadata.objects.filter(id=video_id, visibility='public').values('user_id', 'created_at').first()
+    if video is None:
+        return 0
+
+    channels = Profile.objects.filter(
+        user_id=video['user_id'], total_subscribers__lte=settings.FEED_FANOUT_MAX_SUBSCRIBERS
+    ).values('id')
+    subscribers = (
+        Subscription.objects.filter(channel__in=channels)
+        .values_list('subscriber_id', flat=True)
+        .distinct()
+        .order_by()
+        .iterator(chunk_size=settings.FEED_FANOUT_BATCH_SIZE)
+    )
+
+    score = _score(video['created_at'])
+    client = get_redis()
+    pipe = client.pipeline(transaction=False)
+    written = 0
+    for subscriber_id in subscribers:
+        key = _inbox_key(subscriber_id)
+        pipe.zadd(key, {video_id: score})
+        pipe.zremrangebyrank(key, 0, -settings.FEED_INBOX_SIZE - 1)  # keep the newest FEED_INBOX_SIZE
+        written += 1
+        if written % settings.FEED_FANOUT_BATCH_SIZE == 0:
+            pipe.execute()
+    pipe.execute()
+    return written
+
+
+def _large_channel_users(user_id):
+    return Subscription.objects.filter(
+        subscriber_id=user_id, channel__total_subscribers__gt=settings.FEED_FANOUT_MAX_SUBSCRIBERS
+    ).values('channel__user_id')
+
+
+def get_feed(user_id, page_size, cursor=None):
+    """One page of the user's feed, newest first: (videos, next cursor or None).
+
+    `cursor` is the (score, video id) of the last video of the previous page, see decode_feed_cursor.
+    """
+    # The inbox: page_size + 2 so the cursor's own entry can be dropped and one more tells if there is a next page
+    max_score = cursor[0] if cursor else '+inf'
+    entries = get_redis().zrevrangebyscore(_inbox_key(user_id), max_score, '-inf', start=0, num=page_size + 2, withscores=True)
+    candidates = {int(video_id): int(score) for video_id, score in entries}
+
+    # Channels too big to fan out, read from the (user, created_at) index
+    videos = VideoMetadata.objects.filter(
+        user_id__in=_large_channel_users(user_id), visibility='public'
+    ).order_by('-created_at', '-pk')
+    if cursor:
+        videos = videos.filter(after('created_at', _created_at(cursor[0]), cursor[1]))
+    for video_id, created_at in videos.values_list('id', 'created_at')[:page_size + 1]:
+        candidates[video_id] = _score(created_at)
+
+    ordered = sorted(((score, video_id) for video_id, score in candidates.items()), reverse=True)
+    if cursor:
+        ordered = [entry for entry in ordered if entry < cursor]
+    page, more = ordered[:page_size], len(ordered) > page_size
+
+    # Drops videos deleted or made private since, and channels the user has unsubscribed from
+    found = VideoMetadata.objects.filter(
+        id__in=[video_id for _, video_id in page],
+        visibility='public',
+        user_id__in=Subscription.objects.filter(subscriber_id=user_id).values('channel__user_id'),
+    ).in_bulk()
+    next_cursor = list(page[-1]) if more else None
+    return [found[video_id] for _, video_id in page if video_id in found], next_cursor
@@ -19,6 +19,9 @@ class Like(models.Model):
 
     class Meta:
         unique_together = ('video', 'user')  # A user can only like or dislike a video once
+        indexes = [
+            models.Index(fields=['user', 'created_at']),  # a user's likes, newest first
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.like_status} - {self.video.title}"
@@ -33,6 +36,9 @@ class Subscription(models.Model):
 
     class Meta:
         unique_together = ('subscriber', 'channel')  # Prevent duplicate subscriptions
+        indexes = [
+            models.Index(fields=['channel', 'created_at']),  # a channel's subscribers, newest first
+        ]
         verbose_name = 'Subscription'
         verbose_name_plural = 'Subscriptions'
         
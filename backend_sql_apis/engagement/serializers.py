@@ -20,11 +20,20 @@ class LikeCountSerializer(serializers.Serializer):
     likes = serializers.IntegerField()
     dislikes = serializers.IntegerField()
 
+class UserReactionSerializer(serializers.Serializer):
+    video_id = serializers.IntegerField()
+    like_status = serializers.CharField(allow_null=True)
+
 class VideoMetadataSerializer(serializers.ModelSerializer):
     class Meta:
         model = VideoMetadata
         fields = ['id', 'title', 'description']  # add more fields if needed
 
+class FeedVideoSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = VideoMetadata
+        fields = ['id', 'user', 'title', 'description', 'duration', 'thumbnail_file', 'created_at']
+
 class UserLikeSerializer(serializers.ModelSerializer):
     video = VideoMetadataSerializer()
 
@@ -32,6 +41,11 @@ class UserLikeSerializer(serializers.ModelSerializer):
         model = Like
         fields = ['video', 'like_status', 'created_at']
 
+class UserLikeSlimSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Like
+        fields = ['id', 'video', 'like_status']
+
 class SubscriptionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Subscription
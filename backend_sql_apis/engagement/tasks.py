@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from . import feed
+
+
+@shared_task
+def fan_out_video(video_id):
+    written = feed.fan_out_video(video_id)
+    return f"Video {video_id} pushed to {written} subscription feeds"
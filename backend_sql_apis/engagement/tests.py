@@ -1,3 +1,111 @@
+import base64
+import json
+
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from analytic.redis_client import get_redis
+from users.models import CustomUser, Profile
+from videos.models import VideoMetadata
+
+from . import feed
+from .models import Like
+
+
+def _cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+# Cursors that decode cleanly but do not hold a (created_at, pk) position
+MALFORMED_CURSORS = ['!!', _cursor([1]), _cursor('x'), _cursor(['not a date', 1]), _cursor(['2025-01-01T00:00:00Z', 'x'])]
+
+
+class UserLikeListTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='fan@example.com', password='pw', username='fan')
+        videos = VideoMetadata.objects.bulk_create([
+            VideoMetadata(user=self.user, title=f'v{i}', video_file='v.mp4', thumbnail_file='t.png') for i in range(5)
+        ])
+        Like.objects.bulk_create([Like(video=video, user=self.user, like_status='like') for video in videos])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_pages_cover_every_like_once(self):
+        seen, cursor = [], None
+        while True:
+            response = self.client.get('/engage/likes/user/', {'page_size': 2, 'slim': 'true', **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            seen += [like['id'] for like in response.data['results']]
+            cursor = response.data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(sorted(seen), sorted(Like.objects.values_list('id', flat=True)))
+
+    def test_malformed_cursor_is_rejected(self):
+        for cursor in MALFORMED_CURSORS:
+            response = self.client.get('/engage/likes/user/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 400, cursor)
+            self.assertEqual(response.data, {"error": "Invalid cursor."})
+
+
+class ChannelSubscribersTests(TestCase):
+    def setUp(self):
+        owner = CustomUser.objects.create_user(email='owner@example.com', password='pw', username='owner')
+        self.channel = Profile.objects.create(user=owner, title='channel')
+        for i in range(5):
+            subscriber = CustomUser.objects.create_user(email=f'sub{i}@example.com', password='pw', username=f'sub{i}')
+            client = APIClient()
+            client.force_authenticate(subscriber)
+            client.post(f'/engage/subscribe/{self.channel.id}/')
+        self.client = APIClient()
+
+    def test_pages_cover_every_subscriber_once(self):
+        seen, cursor = [], None
+        while True:
+            response = self.client.get(f'/engage/subscribers/{self.channel.id}/', {'page_size': 2, **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            seen += [user['username'] for user in response.data['results']]
+            cursor = response.data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(sorted(seen), [f'sub{i}' for i in range(5)])
+        self.assertEqual(self.client.get(f'/engage/subscribers/{self.channel.id}/', {'only': 'count'}).data, {'subscriber_count': 5})
+
+    def test_malformed_cursor_is_rejected(self):
+        for cursor in MALFORMED_CURSORS:
+            response = self.client.get(f'/engage/subscribers/{self.channel.id}/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 400, cursor)
+            self.assertEqual(response.data, {"error": "Invalid cursor."})
+
+
+class SubscriptionFeedTests(TestCase):
+    def setUp(self):
+        self.viewer = CustomUser.objects.create_user(email='viewer@example.com', password='pw', username='viewer')
+        get_redis().delete(feed._inbox_key(self.viewer.id))
+        creator = CustomUser.objects.create_user(email='creator@example.com', password='pw', username='creator')
+        channel = Profile.objects.create(user=creator, title='channel')
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+        self.client.post(f'/engage/subscribe/{channel.id}/')
+        self.videos = []
+        for i in range(3):
+            video = VideoMetadata.objects.create(user=creator, title=f'v{i}', video_file='v.mp4', thumbnail_file='t.png')
+            feed.fan_out_video(video.id)
+            self.videos.append(video.id)
+
+    def test_pages_list_new_videos_newest_first(self):
+        seen, cursor = [], None
+        while True:
+            response = self.client.get('/engage/feed/', {'page_size': 2, **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            seen += [video['id'] for video in response.data['results']]
+            cursor = response.data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(seen, self.videos[::-1])
 
-# Create your tests here.
+    def test_malformed_cursor_is_rejected(self):
+        for cursor in ['!!', _cursor([1]), _cursor(['x', 1]), _cursor([1, 'x']), _cursor([-1, 1]), _cursor([10 ** 30, 1])]:
+            response = self.client.get('/engage/feed/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 400, cursor)
+            self.assertEqual(response.data, {"error": "Invalid cursor."})
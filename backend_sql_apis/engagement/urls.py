@@ -1,16 +1,19 @@
 from django.urls import path
-from .views import ChannelSubscribersView, CommentAPIView, CommentDetailAPIView, LikeCountAPIView, LikeVideoAPIView, MySubscriptionsView, SubscribeView, UnsubscribeView, UserLikeListAPIView
+from .views import BulkLikeCountAPIView, ChannelSubscribersView, CommentAPIView, CommentDetailAPIView, LikeCountAPIView, LikeVideoAPIView, MySubscriptionsView, SubscribeView, SubscriptionFeedAPIView, UnsubscribeView, UserLikeListAPIView, UserReactionsAPIView
 
 urlpatterns = [
     # path('like/', LikeCreate.as_view(), name='like-create'),
     # path('like/<int:pk>/', LikeDetail.as_view(), name='like-detail'),
     path('like/video/<int:video_id>/', LikeVideoAPIView.as_view(), name='like-video'),
     path('likes/count/<int:video_id>/', LikeCountAPIView.as_view(), name='like-count'),
+    path('likes/counts/', BulkLikeCountAPIView.as_view(), name='bulk-like-counts'),
+    path('likes/mine/', UserReactionsAPIView.as_view(), name='user-reactions'),
     path('likes/user/', UserLikeListAPIView.as_view(), name='user-likes'),
     
     path('subscribe/<int:channel_id>/', SubscribeView.as_view(), name='subscribe'),
     path('unsubscribe/<int:channel_id>/', UnsubscribeView.as_view(), name='unsubscribe'),
     path('subscriptions/me/', MySubscriptionsView.as_view(), name='my-subscriptions'),
+    path('feed/', SubscriptionFeedAPIView.as_view(), name='subscription-feed'),
     path('subscribers/<int:channelId>/', ChannelSubscribersView.as_view(), name='channel-subscribers'),
 
     # path('subscriptions/', SubscriptionCreate.as_view(), name='subscription-create'),
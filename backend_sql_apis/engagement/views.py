@@ -1,5 +1,6 @@
 import uuid
 
+from django.conf import settings
 from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework.response import Response
@@ -7,14 +8,32 @@ from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
 from django.contrib.auth import get_user_model
 from rest_framework.generics import ListAPIView
+from django.db import transaction
 from django.db.models import F, Case, When, IntegerField, Value
 
+from analytic import trending
+from analytic.cache import invalidate_video_summaries
+from analytic.pagination import after, decode_datetime_cursor, encode_cursor, get_page_size
+from analytic.reactions import adjust_like_counts, get_like_counts, get_user_reactions, invalidate_user_reaction
 from users.models import Profile
+from .feed import decode_feed_cursor, get_feed
 from .models import Like, VideoMetadata, Comment, Subscription
-from .serializers import LikeCountSerializer, LikeSerializer, CommentSerializer, SubscribedChannelSerializer, SubscriberUserSerializer, SubscriptionSerializer, UserLikeSerializer
+from .serializers import FeedVideoSerializer, LikeCountSerializer, LikeSerializer, CommentSerializer, SubscribedChannelSerializer, SubscriberUserSerializer, SubscriptionSerializer, UserLikeSerializer, UserLikeSlimSerializer, UserReactionSerializer
         
 User = get_user_model()
 
+
+def _video_ids(request):
+    """Distinct video ids of ?ids=1,2,3, in order; ValueError if malformed or too many."""
+    try:
+        video_ids = list(dict.fromkeys(int(i) for i in request.query_params.get('ids', '').split(',') if i.strip()))
+    except ValueError:
+        raise ValueError("'ids' must be a comma-separated list of video ids.")
+    if not 1 <= len(video_ids) <= settings.ANALYTICS_LIKE_COUNTS_MAX_IDS:
+        raise ValueError(f"'ids' must hold between 1 and {settings.ANALYTICS_LIKE_COUNTS_MAX_IDS} video ids.")
+    return video_ids
+
+
 class LikeVideoAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -29,45 +48,139 @@ class LikeVideoAPIView(APIView):
 
         try:
             video = get_object_or_404(VideoMetadata, id=video_id)
-            like, created = Like.objects.update_or_create(
-                video=video,
-                user=user,
-                defaults={'like_status': like_status}
-            )
+            with transaction.atomic():
+                # The row lock orders concurrent changes by the same user, so the counters move
+                # from the status each one actually replaced
+                like, created = Like.objects.select_for_update().get_or_create(
+                    video=video,
+                    user=user,
+                    defaults={'like_status': like_status}
+                )
+                previous = None if created else like.like_status
+                if not created and previous != like_status:
+                    like.like_status = like_status
+                    like.save(update_fields=['like_status'])
+                adjust_like_counts(video.id, previous, like_status)
+            invalidate_user_reaction(user.id, video.id)
+            if created and like_status == 'like':
+                trending.record({video.id: 1}, 'like')
+            invalidate_video_summaries([video.id])
             serializer = LikeSerializer(like)
             return Response(serializer.data, status=status.HTTP_200_OK if not created else status.HTTP_201_CREATED)
 
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        
+
+    def delete(self, request, video_id):
+        try:
+            with transaction.atomic():
+                like = Like.objects.select_for_update().filter(video_id=video_id, user=request.user).first()
+                if like is None:
+                    return Response({"error": "You have not reacted to this video."}, status=status.HTTP_404_NOT_FOUND)
+                like.delete()
+                adjust_like_counts(video_id, like.like_status, None)
+            invalidate_user_reaction(request.user.id, video_id)
+            invalidate_video_summaries([video_id])
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 class LikeCountAPIView(APIView):
     def get(self, request, video_id):
-        try:
-            video = VideoMetadata.objects.get(id=video_id)
-        except VideoMetadata.DoesNotExist:
+        counts = get_like_counts([video_id]).get(video_id)
+        if counts is None:
             return Response({"error": "Video not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        like_count = Like.objects.filter(video=video, like_status='like').count()
-        dislike_count = Like.objects.filter(video=video, like_status='dislike').count()
-
         serializer = LikeCountSerializer({
-            "video_id": video.id,
-            "likes": like_count,
-            "dislikes": dislike_count
+            "video_id": video_id,
+            "likes": counts[0],
+            "dislikes": counts[1]
         })
 
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class UserLikeListAPIView(APIView):
+class BulkLikeCountAPIView(APIView):
+    """Likes and dislikes of up to ANALYTICS_LIKE_COUNTS_MAX_IDS videos: ?ids=1,2,3.
+
+    Videos that do not exist are left out.
+    """
+
+    def get(self, request):
+        try:
+            video_ids = _video_ids(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        counts = get_like_counts(video_ids)
+        serializer = LikeCountSerializer([
+            {"video_id": video_id, "likes": counts[video_id][0], "dislikes": counts[video_id][1]}
+            for video_id in video_ids if video_id in counts
+        ], many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class UserReactionsAPIView(APIView):
+    """The caller's like_status ('like', 'dislike' or null) for each video of ?ids=1,2,3."""
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        likes = Like.objects.filter(user=user).select_related('video')
-        serializer = UserLikeSerializer(likes, many=True)
+        try:
+            video_ids = _video_ids(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        reactions = get_user_reactions(request.user.id, video_ids)
+        serializer = UserReactionSerializer([
+            {"video_id": video_id, "like_status": reactions[video_id]} for video_id in video_ids
+        ], many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+
+class UserLikeListAPIView(APIView):
+    """The logged-in user's likes and dislikes, newest first, one keyset-paginated query per page.
+
+    Query params: like_status (like or dislike), slim (true: only ids and statuses, no video
+    details), page_size and cursor (the next_cursor of the previous page).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            page_size = get_page_size(request)
+            cursor = request.query_params.get('cursor')
+            cursor = decode_datetime_cursor(cursor) if cursor else None
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Walks the (user, created_at) index, so a deep page costs the same as the first
+        likes = Like.objects.filter(user=request.user).order_by('-created_at', '-pk')
+        like_status = request.query_params.get('like_status')
+        if like_status:
+            if like_status not in dict(Like.LIKE_STATUS_CHOICES):
+                return Response({"error": "'like_status' must be 'like' or 'dislike'."}, status=status.HTTP_400_BAD_REQUEST)
+            likes = likes.filter(like_status=like_status)
+        if cursor:
+            likes = likes.filter(after('created_at', *cursor))
+
+        slim = request.query_params.get('slim', '').lower() in ('1', 'true')
+        if slim:
+            likes = likes.only('id', 'video_id', 'like_status', 'created_at')
+        else:
+            likes = likes.select_related('video').only(
+                'like_status', 'created_at', 'video__id', 'video__title', 'video__description'
+            )
+
+        page = list(likes[:page_size + 1])
+        next_cursor = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            next_cursor = encode_cursor([page[-1].created_at, page[-1].pk])
+
+        serializer = (UserLikeSlimSerializer if slim else UserLikeSerializer)(page, many=True)
+        return Response({"results": serializer.data, "next_cursor": next_cursor}, status=status.HTTP_200_OK)
+
 class SubscribeView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -85,10 +198,11 @@ class SubscribeView(APIView):
         # Create subscription
         serializer = SubscriptionSerializer(data={'channel': channel.id}, context={'request': request})
         serializer.is_valid(raise_exception=True)
-        serializer.save(subscriber=request.user)
+        with transaction.atomic():
+            serializer.save(subscriber=request.user)
 
-        # Increment total_subscribers safely using F expression
-        Profile.objects.filter(id=channel.id).update(total_subscribers=F('total_subscribers') + 1)
+            # Increment total_subscribers safely using F expression
+            Profile.objects.filter(id=channel.id).update(total_subscribers=F('total_subscribers') + 1)
 
         return Response({"message": "Subscribed successfully."}, status=status.HTTP_201_CREATED)
 
@@ -100,16 +214,17 @@ class UnsubscribeView(APIView):
 
         try:
             subscription = Subscription.objects.get(subscriber=request.user, channel=channel)
-            subscription.delete()
-
-            # Decrement total_subscribers only if it's greater than 0
-            Profile.objects.filter(id=channel.id).update(
-                total_subscribers=Case(
-                    When(total_subscribers__gt=0, then=F('total_subscribers') - 1),
-                    default=0,
-                    output_field=IntegerField()
+            with transaction.atomic():
+                subscription.delete()
+
+                # Decrement total_subscribers only if it's greater than 0
+                Profile.objects.filter(id=channel.id).update(
+                    total_subscribers=Case(
+                        When(total_subscribers__gt=0, then=F('total_subscribers') - 1),
+                        default=0,
+                        output_field=IntegerField()
+                    )
                 )
-            )
 
             return Response({"message": "Unsubscribed successfully."}, status=status.HTTP_204_NO_CONTENT)
 
@@ -123,24 +238,74 @@ class MySubscriptionsView(ListAPIView):
     def get_queryset(self):
         return Profile.objects.filter(subscribers__subscriber=self.request.user)
 
+class SubscriptionFeedAPIView(APIView):
+    """Latest public videos of the channels the user subscribes to, newest first.
+
+    Query params: page_size and cursor (the next_cursor of the previous page).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            page_size = get_page_size(request)
+            cursor = request.query_params.get('cursor')
+            cursor = decode_feed_cursor(cursor) if cursor else None
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            videos, next_cursor = get_feed(request.user.id, page_size, cursor)
+            serializer = FeedVideoSerializer(videos, many=True)
+            return Response({"results": serializer.data, "next_cursor": next_cursor and encode_cursor(next_cursor)})
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 class ChannelSubscribersView(APIView):
+    """Subscribers of a channel, newest first, one keyset-paginated query per page.
+
+    Query params: page_size and cursor (the next_cursor of the previous page), or only=count
+    for just the channel's subscriber count.
+    """
     permission_classes = [IsAuthenticatedOrReadOnly]
 
     def get(self, request, channelId):
+        if request.query_params.get('only') == 'count':
+            # Kept by SubscribeView and UnsubscribeView
+            count = Profile.objects.filter(id=channelId).values_list('total_subscribers', flat=True).first()
+            if count is None:
+                return Response({'error': 'Channel not found'}, status=status.HTTP_404_NOT_FOUND)
+            return Response({'subscriber_count': count})
+
         try:
-            channel = Profile.objects.get(id=channelId)
-        except Profile.DoesNotExist:
+            page_size = get_page_size(request)
+            cursor = request.query_params.get('cursor')
+            cursor = decode_datetime_cursor(cursor) if cursor else None
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Walks the (channel, created_at) index and joins the subscriber in the same query
+        subscriptions = (
+            Subscription.objects.filter(channel_id=channelId)
+            .select_related('subscriber')
+            .only('created_at', 'subscriber__id', 'subscriber__username', 'subscriber__email')
+            .order_by('-created_at', '-pk')
+        )
+        if cursor:
+            subscriptions = subscriptions.filter(after('created_at', *cursor))
+
+        page = list(subscriptions[:page_size + 1])
+        if not page and not cursor and not Profile.objects.filter(id=channelId).exists():
             return Response({'error': 'Channel not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        subscriptions = Subscription.objects.filter(channel=channel)
+        next_cursor = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            next_cursor = encode_cursor([page[-1].created_at, page[-1].pk])
 
-        if request.query_params.get('only') == 'count':
-            return Response({'subscriber_count': subscriptions.count()})
+        serializer = SubscriberUserSerializer([sub.subscriber for sub in page], many=True)
+        return Response({'results': serializer.data, 'next_cursor': next_cursor})
 
-        subscribers = [sub.subscriber for sub in subscriptions]
-        serializer = SubscriberUserSerializer(subscribers, many=True)
-        return Response(serializer.data)
-    
 class CommentAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -0,0 +1,219 @@
+import contextvars
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache as BaseLocMemCache
+from django.core.cache.backends.redis import RedisCache as BaseRedisCache
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.decorators import sync_and_async_middleware
+
+# Per-endpoint request metrics, aggregated in this process and served in Prometheus text format
+# on /metrics. Each worker process keeps its own numbers, so scrape every worker (or sum them).
+
+logger = logging.getLogger('sql_apis.slow_requests')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Stats of the request being handled. A context variable, so queries run by async views through
+# sync_to_async (in another thread) are still counted against their request.
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+_lock = threading.Lock()
+_requests = defaultdict(int)  # (view, method, status) -> count
+_endpoints = defaultdict(lambda: {
+    'buckets': [0] * len(LATENCY_BUCKETS),
+    'count': 0,
+    'seconds': 0.0,
+    'queries': 0,
+    'query_seconds': 0.0,
+    'cache_hits': 0,
+    'cache_misses': 0,
+    'response_bytes': 0,
+})
+
+
+class _RequestStats:
+    __slots__ = ('queries', 'query_seconds', 'cache_hits', 'cache_misses', 'sql')
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.sql = []  # (seconds, sql) of the first METRICS_SLOW_REQUEST_MAX_QUERIES queries
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        stats.queries += 1
+        stats.query_seconds += elapsed
+        if len(stats.sql) < settings.METRICS_SLOW_REQUEST_MAX_QUERIES:
+            stats.sql.append((elapsed, sql))
+
+
+def _install_query_recorder(sender, connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(_install_query_recorder)
+
+
+def _install_on_open_connections():
+    # Connections this thread opened before this module was imported never sent connection_created
+    for connection in connections.all(initialized_only=True):
+        _install_query_recorder(None, connection)
+
+
+def _record_cache(hits, misses):
+    stats = _current.get()
+    if stats is not None:
+        stats.cache_hits += hits
+        stats.cache_misses += misses
+
+
+_MISSING = object()
+
+
+class CacheStatsMixin:
+    """Counts cache hits and misses against the current request."""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        _record_cache(value is not _MISSING, value is _MISSING)
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = super().get_many(keys, version)
+        _record_cache(len(found), len(keys) - len(found))
+        return found
+
+
+class RedisCache(CacheStatsMixin, BaseRedisCache):
+    pass
+
+
+class LocMemCache(CacheStatsMixin, BaseLocMemCache):
+    pass
+
+
+def _observe(request, response, stats, elapsed):
+    match = getattr(request, 'resolver_match', None)
+    view = match.view_name if match else 'unresolved'
+    size = 0 if response.streaming else len(response.content)
+
+    with _lock:
+        _requests[(view, request.method, response.status_code)] += 1
+        endpoint = _endpoints[view]
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if elapsed <= bound:
+                endpoint['buckets'][i] += 1
+                break
+        endpoint['count'] += 1
+        endpoint['seconds'] += elapsed
+        endpoint['queries'] += stats.queries
+        endpoint['query_seconds'] += stats.query_seconds
+        endpoint['cache_hits'] += stats.cache_hits
+        endpoint['cache_misses'] += stats.cache_misses
+        endpoint['response_bytes'] += size
+
+    if elapsed >= settings.METRICS_SLOW_REQUEST_SECONDS:
+        logger.warning(
+            "Slow request %s %s (%s): %.3fs, %d queries in %.3fs\n%s",
+            request.method, request.path, view, elapsed, stats.queries, stats.query_seconds,
+            "\n".join(f"{seconds * 1000:8.1f} ms  {sql}" for seconds, sql in stats.sql),
+        )
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """Records latency, SQL queries and time, cache hits and misses and response size per URL name."""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            stats = _RequestStats()
+            token = _current.set(stats)
+            started = time.perf_counter()
+            try:
+                response = await get_response(request)
+            finally:
+                _current.reset(token)
+            _observe(request, response, stats, time.perf_counter() - started)
+            return response
+    else:
+        def middleware(request):
+            _install_on_open_connections()
+            stats = _RequestStats()
+            token = _current.set(stats)
+            started = time.perf_counter()
+            try:
+                response = get_response(request)
+            finally:
+                _current.reset(token)
+            _observe(request, response, stats, time.perf_counter() - started)
+            return response
+    return middleware
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        requests = dict(_requests)
+        endpoints = {view: {**totals, 'buckets': list(totals['buckets'])} for view, totals in _endpoints.items()}
+
+    lines = [
+        "# HELP http_requests_total Requests by URL name, method and status code.",
+        "# TYPE http_requests_total counter",
+    ]
+    for (view, method, status), count in sorted(requests.items()):
+        lines.append(f'http_requests_total{{view="{_label(view)}",method="{method}",status="{status}"}} {count}')
+
+    lines += [
+        "# HELP http_request_duration_seconds Request latency by URL name.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for view, totals in sorted(endpoints.items()):
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, totals['buckets']):
+            cumulative += count
+            lines.append(f'http_request_duration_seconds_bucket{{view="{_label(view)}",le="{bound}"}} {cumulative}')
+        lines.append(f'http_request_duration_seconds_bucket{{view="{_label(view)}",le="+Inf"}} {totals["count"]}')
+        lines.append(f'http_request_duration_seconds_sum{{view="{_label(view)}"}} {totals["seconds"]}')
+        lines.append(f'http_request_duration_seconds_count{{view="{_label(view)}"}} {totals["count"]}')
+
+    counters = [
+        ('http_request_db_queries_total', 'queries', 'SQL queries run by requests, by URL name.'),
+        ('http_request_db_seconds_total', 'query_seconds', 'Time spent in SQL queries, by URL name.'),
+        ('http_request_cache_hits_total', 'cache_hits', 'Cache hits during requests, by URL name.'),
+        ('http_request_cache_misses_total', 'cache_misses', 'Cache misses during requests, by URL name.'),
+        ('http_response_size_bytes_total', 'response_bytes', 'Response body bytes (streamed bodies excluded), by URL name.'),
+    ]
+    for name, field, help_text in counters:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for view, totals in sorted(endpoints.items()):
+            lines.append(f'{name}{{view="{_label(view)}"}} {totals[field]}')
+
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -81,6 +81,7 @@ AUTHENTICATION_BACKENDS = [
 ]
 
 MIDDLEWARE = [
+    'sql_apis.metrics.metrics_middleware',  # first, so it times the whole stack
     'corsheaders.middleware.CorsMiddleware',
     'allauth.account.middleware.AccountMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -94,6 +95,11 @@ MIDDLEWARE = [
 
 CORS_ALLOW_ALL_ORIGINS = True  # For testing only; restrict in production
 
+# Request metrics (sql_apis.metrics), served in Prometheus text format on /metrics
+METRICS_ALLOWED_IPS = env.list("METRICS_ALLOWED_IPS", default=["127.0.0.1", "::1"])  # clients allowed to scrape
+METRICS_SLOW_REQUEST_SECONDS = env.float("METRICS_SLOW_REQUEST_SECONDS", default=1.0)  # log the SQL of slower requests
+METRICS_SLOW_REQUEST_MAX_QUERIES = env.int("METRICS_SLOW_REQUEST_MAX_QUERIES", default=100)  # statements kept per request
+
 
 ROOT_URLCONF = 'sql_apis.urls'
 
@@ -119,25 +125,39 @@ WSGI_APPLICATION = 'sql_apis.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': env('DB_NAME'),
-        'USER': env('DB_USER'),
-        'PASSWORD': env('DB_PASSWORD'),
-        'HOST': env('DB_HOST'),
-        'PORT': env('DB_PORT'),
+if env("DB_ENGINE", default="postgresql") == "sqlite":
+    # Local file database for offline runs, e.g. python manage.py benchmark
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': env('DB_NAME', default=str(BASE_DIR / 'db.sqlite3')),
+            # Writers queue for the lock instead of failing with "database is locked" under concurrent requests
+            'OPTIONS': {'timeout': 20, 'transaction_mode': 'IMMEDIATE', 'init_command': 'PRAGMA journal_mode=WAL;'},
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': env('DB_NAME'),
+            'USER': env('DB_USER'),
+            'PASSWORD': env('DB_PASSWORD'),
+            'HOST': env('DB_HOST'),
+            'PORT': env('DB_PORT'),
+        }
     }
-}
 
 
 # Redis
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "BACKEND": "sql_apis.metrics.RedisCache",  # Django's RedisCache, counting hits and misses
         "LOCATION": env("REDIS_URL"),
     }
 }
+if CACHES["default"]["LOCATION"].startswith("locmem://"):
+    # In-process cache for offline runs without a Redis server
+    CACHES["default"] = {"BACKEND": "sql_apis.metrics.LocMemCache", "LOCATION": "locmem://"}
 
 CELERY_BROKER_URL = env("CELERY_BROKER_URL")
 
@@ -147,6 +167,83 @@ CELERY_BROKER_URL = 'redis://127.0.0.1:6379/0'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 
+# Analytics ingestion
+# Redis used for analytics counters; defaults to the cache server. "fakeredis://" runs against an in-process stand-in.
+ANALYTICS_REDIS_URL = env(
+    "ANALYTICS_REDIS_URL",
+    default="fakeredis://" if CACHES["default"]["LOCATION"] == "locmem://" else CACHES["default"]["LOCATION"],
+)
+# When enabled, views are counted in Redis and flushed to VideoAnalytics.views by Celery beat
+ANALYTICS_VIEW_BUFFER_ENABLED = env.bool("ANALYTICS_VIEW_BUFFER_ENABLED", default=False)
+ANALYTICS_VIEW_FLUSH_INTERVAL = env.int("ANALYTICS_VIEW_FLUSH_INTERVAL", default=10)  # seconds
+ANALYTICS_VIEW_FLUSH_BATCH_SIZE = env.int("ANALYTICS_VIEW_FLUSH_BATCH_SIZE", default=500)  # videos per UPDATE
+ANALYTICS_ENGAGEMENT_BATCH_MAX_SIZE = env.int("ANALYTICS_ENGAGEMENT_BATCH_MAX_SIZE", default=1000)  # events per request
+# Client event ids are de-duplicated with a rotating Bloom filter in Redis (two windows kept)
+ANALYTICS_DEDUPE_WINDOW = env.int("ANALYTICS_DEDUPE_WINDOW", default=600)  # seconds per filter
+ANALYTICS_DEDUPE_CAPACITY = env.int("ANALYTICS_DEDUPE_CAPACITY", default=1_000_000)  # event ids per window
+ANALYTICS_DEDUPE_ERROR_RATE = env.float("ANALYTICS_DEDUPE_ERROR_RATE", default=0.001)  # false positives at capacity
+# Per-video summaries are cached in CACHES["default"]; writes invalidate them, the TTL catches the rest
+ANALYTICS_SUMMARY_CACHE_TTL = env.int("ANALYTICS_SUMMARY_CACHE_TTL", default=60)  # seconds
+ANALYTICS_SUMMARY_LOCK_TIMEOUT = env.int("ANALYTICS_SUMMARY_LOCK_TIMEOUT", default=5)  # seconds a recompute may take
+ANALYTICS_LIKE_COUNTS_CACHE_TTL = env.int("ANALYTICS_LIKE_COUNTS_CACHE_TTL", default=300)  # seconds
+ANALYTICS_LIKE_COUNTS_MAX_IDS = env.int("ANALYTICS_LIKE_COUNTS_MAX_IDS", default=100)  # videos per bulk lookup
+ANALYTICS_USER_REACTIONS_CACHE_TTL = env.int("ANALYTICS_USER_REACTIONS_CACHE_TTL", default=300)  # seconds
+# Hourly/daily rollups are folded in from raw events by Celery beat
+ANALYTICS_ROLLUP_INTERVAL = env.int("ANALYTICS_ROLLUP_INTERVAL", default=60)  # seconds
+ANALYTICS_ROLLUP_BATCH_SIZE = env.int("ANALYTICS_ROLLUP_BATCH_SIZE", default=5000)  # raw rows per transaction
+ANALYTICS_ROLLUP_LAG = env.int("ANALYTICS_ROLLUP_LAG", default=5)  # seconds to wait for in-flight inserts
+ANALYTICS_TOTALS_INTERVAL = env.int("ANALYTICS_TOTALS_INTERVAL", default=300)  # seconds between platform total refreshes
+ANALYTICS_SERIES_MAX_POINTS = env.int("ANALYTICS_SERIES_MAX_POINTS", default=1000)  # buckets per ?granularity= series
+# Trending: one Redis sorted set per half-life (hours); the first one is the endpoint default
+ANALYTICS_TRENDING_HALF_LIVES = env.list("ANALYTICS_TRENDING_HALF_LIVES", cast=int, default=[24, 6, 72])
+ANALYTICS_TRENDING_WEIGHTS = {'view': 1.0, 'like': 5.0, 'engagement': 0.2}
+ANALYTICS_TRENDING_WINDOW_HALF_LIVES = 8  # rebuilds ignore activity older than this many half-lives
+ANALYTICS_TRENDING_REBUILD_INTERVAL = env.int("ANALYTICS_TRENDING_REBUILD_INTERVAL", default=900)  # seconds
+ANALYTICS_TRENDING_MAX_K = 100
+# Days a per-video, per-day unique viewer sketch is kept
+ANALYTICS_UNIQUE_VIEWERS_RETENTION_DAYS = env.int("ANALYTICS_UNIQUE_VIEWERS_RETENTION_DAYS", default=400)
+# Audience-retention curves are recomputed for videos with new engagement events
+ANALYTICS_RETENTION_INTERVAL = env.int("ANALYTICS_RETENTION_INTERVAL", default=3600)  # seconds
+ANALYTICS_RETENTION_VIDEO_CHUNK = env.int("ANALYTICS_RETENTION_VIDEO_CHUNK", default=200)  # videos loaded at once
+# Engagement events: days kept per event type, monthly partitions created ahead of time, and the
+# schema retired partitions are moved to (they are dropped when it is blank)
+ANALYTICS_ENGAGEMENT_RETENTION_DAYS = {'hover': 7, 'seek': 90, 'pause': 365, 'resume': 365}
+ANALYTICS_ENGAGEMENT_PARTITIONS_AHEAD = env.int("ANALYTICS_ENGAGEMENT_PARTITIONS_AHEAD", default=3)
+ANALYTICS_ENGAGEMENT_ARCHIVE_SCHEMA = env("ANALYTICS_ENGAGEMENT_ARCHIVE_SCHEMA", default="")
+
+# Subscription feed: new videos are pushed into subscriber inboxes (in ANALYTICS_REDIS_URL) unless
+# the channel has more than FEED_FANOUT_MAX_SUBSCRIBERS; those are merged in when the feed is read
+FEED_INBOX_SIZE = env.int("FEED_INBOX_SIZE", default=500)  # newest videos kept per inbox
+FEED_FANOUT_MAX_SUBSCRIBERS = env.int("FEED_FANOUT_MAX_SUBSCRIBERS", default=10_000)
+FEED_FANOUT_BATCH_SIZE = env.int("FEED_FANOUT_BATCH_SIZE", default=1000)  # inboxes per Redis round trip
+
+CELERY_BEAT_SCHEDULE = {
+    'flush-view-buffer': {
+        'task': 'analytic.tasks.flush_view_buffer',
+        'schedule': ANALYTICS_VIEW_FLUSH_INTERVAL,
+    },
+    'update-analytics-rollups': {
+        'task': 'analytic.tasks.update_analytics_rollups',
+        'schedule': ANALYTICS_ROLLUP_INTERVAL,
+    },
+    'reconcile-analytics-totals': {
+        'task': 'analytic.tasks.reconcile_analytics_totals',
+        'schedule': ANALYTICS_TOTALS_INTERVAL,
+    },
+    'rebuild-trending-scores': {
+        'task': 'analytic.tasks.rebuild_trending_scores',
+        'schedule': ANALYTICS_TRENDING_REBUILD_INTERVAL,
+    },
+    'update-retention-curves': {
+        'task': 'analytic.tasks.update_retention_curves',
+        'schedule': ANALYTICS_RETENTION_INTERVAL,
+    },
+    'maintain-engagement-partitions': {
+        'task': 'analytic.tasks.maintain_engagement_partitions',
+        'schedule': 24 * 3600,
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
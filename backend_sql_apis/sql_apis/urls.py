@@ -19,6 +19,8 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from .metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('account/',include('users.urls')), 
@@ -28,6 +30,8 @@ urlpatterns = [
     path('engage/',include('engagement.urls')),
     path('analytics/',include('analytic.urls')),
 
+    path('metrics', metrics_view, name='metrics'),
+
 ]
 
 if settings.DEBUG:
@@ -32,5 +32,10 @@ class VideoMetadata(models.Model):
     video_file = models.FileField(upload_to='videos/')
     thumbnail_file = models.ImageField(upload_to='thumbnails/')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at']),  # a channel's videos, newest first (subscription feed)
+        ]
+
     def __str__(self):
         return f"{self.title} ({self.visibility}, {self.duration})"
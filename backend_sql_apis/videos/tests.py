@@ -1,3 +1,55 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from kombu.exceptions import OperationalError
+from PIL import Image
+from rest_framework.test import APIClient
+
+from users.models import CustomUser
+
+from .models import VideoMetadata
+
+
+class VideoUploadTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.user = CustomUser.objects.create_user(email='creator@example.com', password='pw', username='creator')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _upload(self, **fields):
+        thumbnail = io.BytesIO()
+        Image.new('RGB', (2, 2)).save(thumbnail, 'PNG')
+        with override_settings(MEDIA_ROOT=self.media_root):
+            return self.client.post('/videos/video-metadata/', {
+                'title': 'upload',
+                'video_file': SimpleUploadedFile('video.mp4', b'video'),
+                'thumbnail_file': SimpleUploadedFile('thumbnail.png', thumbnail.getvalue()),
+                **fields,
+            }, format='multipart')
+
+    def test_upload_succeeds_when_fan_out_cannot_be_queued(self):
+        with mock.patch('videos.views.fan_out_video.delay', side_effect=OperationalError("broker down")) as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self._upload()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(VideoMetadata.objects.filter(user=self.user).count(), 1)
+        delay.assert_called_once_with(response.data['id'])
+
+    def test_video_made_public_is_fanned_out(self):
+        with mock.patch('videos.views.fan_out_video.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                video_id = self._upload(visibility='private').data['id']
+            delay.assert_not_called()
+
+            for visibility, fanned_out in [('unlisted', False), ('public', True), ('public', False)]:
+                delay.reset_mock()
+                with self.captureOnCommitCallbacks(execute=True):
+                    response = self.client.put(f'/videos/video-metadata/{video_id}/', {'visibility': visibility}, format='json')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(delay.call_count, int(fanned_out), visibility)
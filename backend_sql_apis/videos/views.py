@@ -1,15 +1,20 @@
 from django.conf import settings
+from django.db import transaction
 from rest_framework import status, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.generics import GenericAPIView
 import base64
+import logging
 import os
 import uuid
 
+from engagement.tasks import fan_out_video
 from .serializers import VideoMetadataSerializer
 from .models import VideoMetadata
 
+logger = logging.getLogger(__name__)
+
 
 class IsOwner(permissions.BasePermission):
     """
@@ -18,6 +23,16 @@ class IsOwner(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         return obj.user == request.user
 
+
+def _queue_fan_out(video_id):
+    # The upload is already committed; a broker outage only keeps this video out of subscribers'
+    # feed inboxes, so it must not fail the request (and make the client upload again)
+    try:
+        fan_out_video.delay(video_id)
+    except Exception:
+        logger.warning("Could not queue the feed fan-out of video %s", video_id, exc_info=True)
+
+
 class VideoMetadataCreate(GenericAPIView):
     """
     Create new video metadata for the logged-in user.
@@ -31,7 +46,12 @@ class VideoMetadataCreate(GenericAPIView):
         try:
             serializer = VideoMetadataSerializer(data=request.data)
             if serializer.is_valid():
-                serializer.save(user=request.user)
+                with transaction.atomic():
+                    video = serializer.save(user=request.user)
+                    # Push the video into subscribers' feeds in the background, once it is committed;
+                    # private and unlisted videos are fanned out when they are made public
+                    if video.visibility == 'public':
+                        transaction.on_commit(lambda: _queue_fan_out(video.id))
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
@@ -64,7 +84,12 @@ class VideoMetadataDetail(APIView):
         if video:
             serializer = VideoMetadataSerializer(video, data=request.data, partial=True)  # allow partial update
             if serializer.is_valid():
-                serializer.save()
+                was_public = video.visibility == 'public'
+                with transaction.atomic():
+                    video = serializer.save()
+                    # A video made public now reaches the feeds a public upload would have
+                    if video.visibility == 'public' and not was_public:
+                        transaction.on_commit(lambda: _queue_fan_out(video.id))
                 return Response(serializer.data)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         return Response({'error': 'VideoMetadata not found'}, status=status.HTTP_404_NOT_FOUND)